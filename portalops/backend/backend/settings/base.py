@@ -22,6 +22,7 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'rest_framework',
+    'adrf',
     'corsheaders',
     'shared',
     'project',
@@ -64,6 +65,16 @@ DATABASES = {
 REDIS_HOST = os.getenv("REDIS_HOST", "redis")
 REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
 REDIS_DB = int(os.getenv("REDIS_DB", 0))
+REDIS_PASSWORD = os.getenv("REDIS_PASSWORD")
+# Connect through a Unix socket instead of host/port when set
+REDIS_SOCKET_PATH = os.getenv("REDIS_SOCKET_PATH")
+# 2 = RESP2, 3 = RESP3
+REDIS_PROTOCOL = int(os.getenv("REDIS_PROTOCOL", 2))
+# Per-process pool size; callers block up to REDIS_POOL_TIMEOUT seconds for a free socket
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", 20))
+REDIS_POOL_TIMEOUT = int(os.getenv("REDIS_POOL_TIMEOUT", 5))
+REDIS_SOCKET_TIMEOUT = int(os.getenv("REDIS_SOCKET_TIMEOUT", 5))
+REDIS_HEALTH_CHECK_INTERVAL = int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", 30))
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -117,6 +128,12 @@ CORS_ALLOW_HEADERS = list(default_headers) + [
     'X-CSRFToken',
 ]
 
+CORS_EXPOSE_HEADERS = [
+    'ETag',
+    'Link',
+    'X-Next-Cursor',
+]
+
 import yaml
 from pathlib import Path
 
@@ -139,15 +156,40 @@ CACHES = {
         }
     }
 }
-#
-# from celery.schedules import crontab
-# CELERY_IMPORTS = ("userauth.tasks",)
-# CELERY_BEAT_SCHEDULE = {
-#     "update-vm-counts-every-30min": {
-#         "task": "userauth.tasks.sync_vm_count_for_all_users",
-#         "schedule": crontab(minute="*/30"),
-#     },
-# }
+
+# Floating IP sync cadence (seconds): cheap incremental runs driven by Neutron
+# changed_since, plus a slower full reconcile that also catches deletions.
+FLOATING_IP_SYNC_INTERVAL = config("FLOATING_IP_SYNC_INTERVAL", default=60, cast=int)
+FLOATING_IP_FULL_SYNC_INTERVAL = config("FLOATING_IP_FULL_SYNC_INTERVAL", default=3600, cast=int)
+
+# Admin system summary snapshot cadence (seconds)
+SYSTEM_SUMMARY_INTERVAL = config("SYSTEM_SUMMARY_INTERVAL", default=300, cast=int)
+
+# UserProfile.vm_count recount cadence (seconds)
+USER_VM_COUNT_SYNC_INTERVAL = config("USER_VM_COUNT_SYNC_INTERVAL", default=1800, cast=int)
+
+CELERY_BEAT_SCHEDULE = {
+    "sync-floating-ips-incremental": {
+        "task": "project.tasks.sync_floating_ips_incremental_task",
+        "schedule": FLOATING_IP_SYNC_INTERVAL,
+    },
+    "sync-floating-ips-full": {
+        "task": "project.tasks.sync_floating_ips_task",
+        "schedule": FLOATING_IP_FULL_SYNC_INTERVAL,
+    },
+    "refresh-system-summary": {
+        "task": "overview.tasks.refresh_system_summary",
+        "schedule": SYSTEM_SUMMARY_INTERVAL,
+    },
+    "update-user-vm-counts": {
+        "task": "userauth.tasks.update_user_vm_counts",
+        "schedule": USER_VM_COUNT_SYNC_INTERVAL,
+    },
+    "cleanup-image-import-staging": {
+        "task": "openstack_portal.tasks.cleanup_image_import_staging",
+        "schedule": 3600,
+    },
+}
 
 
 OPENSTACK_ADMIN_NAME= config("OPENSTACK_ADMIN_NAME")
@@ -166,6 +208,89 @@ OPENSTACK_COMPUTE_URL = config("OPENSTACK_COMPUTE_URL").rstrip("/")
 OPENSTACK_NETWORK_URL = config("OPENSTACK_NETWORK_URL").rstrip("/")
 OPENSTACK_BLOCK_STORAGE_URL = config("OPENSTACK_STORAGE_URL").rstrip("/")
 
+# Shared httpx.AsyncClient of the async views (utils/async_http.py), one per
+# event loop, i.e. per uvicorn worker
+ASYNC_HTTP_TIMEOUT = config("ASYNC_HTTP_TIMEOUT", default=30, cast=float)
+ASYNC_HTTP_MAX_CONNECTIONS = config("ASYNC_HTTP_MAX_CONNECTIONS", default=200, cast=int)
+ASYNC_HTTP_MAX_KEEPALIVE = config("ASYNC_HTTP_MAX_KEEPALIVE", default=50, cast=int)
+
+# Per-process pool of authenticated OpenStack connections (utils/conn.py)
+OPENSTACK_CONN_CACHE_SIZE = config("OPENSTACK_CONN_CACHE_SIZE", default=256, cast=int)
+OPENSTACK_CONN_CACHE_TTL = config("OPENSTACK_CONN_CACHE_TTL", default=3600, cast=int)
+
+# Nova flavor map shared by instance cache refreshes (overview/tasks.py)
+FLAVOR_CACHE_TTL = config("FLAVOR_CACHE_TTL", default=3600, cast=int)
+
+# Per-process flavor map of the admin project views (openstack_portal/services/nova.py)
+FLAVOR_MAP_CACHE_TTL = config("FLAVOR_MAP_CACHE_TTL", default=600, cast=int)
+
+# Page size of Nova server listings in the admin project views
+NOVA_PAGE_SIZE = config("NOVA_PAGE_SIZE", default=200, cast=int)
+
+# Instance list cache (overview/tasks.py): served as-is until the soft TTL,
+# served while a background refresh runs until the hard TTL
+INSTANCES_CACHE_SOFT_TTL = config("INSTANCES_CACHE_SOFT_TTL", default=300, cast=int)
+INSTANCES_CACHE_HARD_TTL = config("INSTANCES_CACHE_HARD_TTL", default=86400, cast=int)
+# Seconds after an instance action before the cached list is re-crawled
+INSTANCE_RECONCILE_DELAY = config("INSTANCE_RECONCILE_DELAY", default=15, cast=int)
+
+# Per-source timeouts (seconds) for the instance options fan-out (openstack_portal/tasks.py)
+INSTANCE_OPTIONS_TIMEOUT = config("INSTANCE_OPTIONS_TIMEOUT", default=10, cast=int)
+INSTANCE_OPTIONS_TIMEOUTS = {
+    "regions": config("INSTANCE_OPTIONS_REGIONS_TIMEOUT", default=INSTANCE_OPTIONS_TIMEOUT, cast=int),
+    "flavors": config("INSTANCE_OPTIONS_PLANS_TIMEOUT", default=INSTANCE_OPTIONS_TIMEOUT, cast=int),
+    "images": config("INSTANCE_OPTIONS_IMAGES_TIMEOUT", default=INSTANCE_OPTIONS_TIMEOUT, cast=int),
+    "networks": config("INSTANCE_OPTIONS_NETWORKS_TIMEOUT", default=INSTANCE_OPTIONS_TIMEOUT, cast=int),
+}
+
+# Two-tier catalog: public images/flavors/AZs shared by all users, private
+# items per project. The public tier is revalidated against Glance every
+# CATALOG_REVALIDATE_INTERVAL seconds and refetched in full after CATALOG_PUBLIC_TTL.
+CATALOG_PUBLIC_TTL = config("CATALOG_PUBLIC_TTL", default=3600, cast=int)
+CATALOG_REVALIDATE_INTERVAL = config("CATALOG_REVALIDATE_INTERVAL", default=300, cast=int)
+CATALOG_PROJECT_TTL = config("CATALOG_PROJECT_TTL", default=3000, cast=int)
+
+# Cursor pagination of list endpoints (utils.pagination)
+PAGE_DEFAULT_LIMIT = config("PAGE_DEFAULT_LIMIT", default=100, cast=int)
+PAGE_MAX_LIMIT = config("PAGE_MAX_LIMIT", default=1000, cast=int)
+
+# Image uploads are spooled to disk (FILE_UPLOAD_TEMP_DIR) and streamed to
+# Glance in IMAGE_UPLOAD_CHUNK_SIZE chunks
+FILE_UPLOAD_TEMP_DIR = config("FILE_UPLOAD_TEMP_DIR", default=None)
+IMAGE_UPLOAD_CHUNK_SIZE = config("IMAGE_UPLOAD_CHUNK_SIZE", default=1024 * 1024, cast=int)
+
+# Resumable image import jobs (openstack_portal/services/image_import.py).
+# The staging dir must be shared by the web and celery worker containers.
+IMAGE_IMPORT_STAGING_DIR = config("IMAGE_IMPORT_STAGING_DIR", default=str(BASE_DIR / "image_imports"))
+IMAGE_IMPORT_MAX_SIZE = config("IMAGE_IMPORT_MAX_SIZE", default=64 * 1024 ** 3, cast=int)
+IMAGE_IMPORT_JOB_TTL = config("IMAGE_IMPORT_JOB_TTL", default=86400, cast=int)
+IMAGE_IMPORT_CHUNK_TIMEOUT = config("IMAGE_IMPORT_CHUNK_TIMEOUT", default=300, cast=int)
+IMAGE_IMPORT_MAX_RETRIES = config("IMAGE_IMPORT_MAX_RETRIES", default=3, cast=int)
+IMAGE_IMPORT_RETRY_DELAY = config("IMAGE_IMPORT_RETRY_DELAY", default=60, cast=int)
+
+# Page size for Glance image listings
+GLANCE_PAGE_SIZE = config("GLANCE_PAGE_SIZE", default=200, cast=int)
+
+# Rows per bulk upsert statement in project.service.sync_floating_ips
+FLOATING_IP_SYNC_BATCH_SIZE = config("FLOATING_IP_SYNC_BATCH_SIZE", default=1000, cast=int)
+
+# Keystone enabled/disabled map shown in the admin project list
+ALL_PROJECTS_STATUS_CACHE_TTL = config("ALL_PROJECTS_STATUS_CACHE_TTL", default=30, cast=int)
+
+# Dashboard quota summary (overview/limits.py): fresh for LIMITS_CACHE_TTL,
+# kept LIMITS_STALE_TTL as the fallback of a failing backend
+LIMITS_CACHE_TTL = config("LIMITS_CACHE_TTL", default=30, cast=int)
+LIMITS_STALE_TTL = config("LIMITS_STALE_TTL", default=3600, cast=int)
+LIMITS_BACKEND_TIMEOUT = config("LIMITS_BACKEND_TIMEOUT", default=3, cast=float)
+
+# Per-instance VPS detail cache; dropped on every instance action
+VPS_DETAIL_CACHE_TTL = config("VPS_DETAIL_CACHE_TTL", default=15, cast=int)
+
+# Encoding of values stored in the Redis caches (utils/cache_codec.py)
+CACHE_SERIALIZER = config("CACHE_SERIALIZER", default="orjson")  # json | orjson | msgpack
+CACHE_COMPRESSION = config("CACHE_COMPRESSION", default="zlib")  # none | zlib | lz4
+CACHE_COMPRESSION_THRESHOLD = config("CACHE_COMPRESSION_THRESHOLD", default=4096, cast=int)
+
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = config('EMAIL_HOST')
 EMAIL_PORT = config('EMAIL_PORT', cast=int)
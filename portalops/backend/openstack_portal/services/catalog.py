@@ -0,0 +1,283 @@
+"""
+Two-tier catalog cache behind the instance options endpoint.
+
+* Public tier (``catalog:public``) -- public images, public flavors and
+  availability zones. Identical for every user, so it is cached once for the
+  whole portal. It is revalidated every CATALOG_REVALIDATE_INTERVAL seconds with
+  a cheap Glance ``updated_at=gt:<last seen>`` query and fully refreshed after
+  CATALOG_PUBLIC_TTL.
+* Project tier (``catalog:project:<project_id>``) -- images owned by or shared
+  with the project, private flavors and networks.
+
+The instance options returned to clients are merged from both tiers at read
+time. Each tier carries an etag (content hash) so clients can revalidate with
+If-None-Match.
+"""
+import hashlib
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from django.conf import settings
+
+from utils.cache_codec import encode
+from utils.redis_client import cache_get, cache_set
+from utils.singleflight import single_flight
+
+logger = logging.getLogger(__name__)
+
+PUBLIC_CATALOG_KEY = "catalog:public"
+
+# Shared, bounded pool for catalog fan-out. A source that times out keeps its
+# worker until the OpenStack call returns, so the pool is not created per call.
+_catalog_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="catalog")
+
+
+def project_catalog_key(project_id):
+    return f"catalog:project:{project_id}"
+
+
+def _image_entry(img):
+    return {
+        "id": img.id,
+        "name": img.name,
+        "disk_format": img.disk_format,
+        "owner_id": img.owner_id,
+        "updated_at": img.updated_at,
+    }
+
+
+def _flavor_entry(flavor):
+    return {
+        "id": flavor.id,
+        "label": f"{flavor.name} - {flavor.vcpus} CPU, {flavor.ram}MB RAM, {flavor.disk}GB SSD"
+    }
+
+
+def _fetch_regions(conn, project_id):
+    return [az.name for az in conn.compute.availability_zones() if az.state.get('available', False)]
+
+
+def _fetch_public_images(conn, project_id):
+    return [_image_entry(img) for img in conn.image.images(visibility="public")]
+
+
+def _fetch_public_flavors(conn, project_id):
+    return [_flavor_entry(flavor) for flavor in conn.compute.flavors(is_public=True)]
+
+
+def _fetch_owned_images(conn, project_id):
+    return [_image_entry(img) for img in conn.image.images(owner=project_id)]
+
+
+def _fetch_shared_images(conn, project_id):
+    return [_image_entry(img) for img in conn.image.images(visibility="shared")]
+
+
+def _fetch_private_flavors(conn, project_id):
+    # Nova ignores is_public=False for non-admin tokens and also returns the
+    # public flavors, which already live in the public tier
+    return [
+        _flavor_entry(flavor)
+        for flavor in conn.compute.flavors(is_public=False)
+        if not flavor.is_public
+    ]
+
+
+def _fetch_networks(conn, project_id):
+    return [{"id": net.id, "name": net.name} for net in conn.network.networks()]
+
+
+PUBLIC_SOURCES = {
+    "regions": _fetch_regions,
+    "images": _fetch_public_images,
+    "flavors": _fetch_public_flavors,
+}
+
+PROJECT_SOURCES = {
+    "owned_images": _fetch_owned_images,
+    "shared_images": _fetch_shared_images,
+    "flavors": _fetch_private_flavors,
+    "networks": _fetch_networks,
+}
+
+TIER_SOURCES = {"public": PUBLIC_SOURCES, "project": PROJECT_SOURCES}
+
+
+def _section(source):
+    # owned_images / shared_images fill (and time out as) the images section
+    return source.rsplit("_", 1)[-1]
+
+
+def _source_timeout(source):
+    timeouts = getattr(settings, "INSTANCE_OPTIONS_TIMEOUTS", {})
+    return timeouts.get(_section(source), getattr(settings, "INSTANCE_OPTIONS_TIMEOUT", 10))
+
+
+def _fan_out(conn, project_id, tiers):
+    """
+    Run the fetchers of all given tiers concurrently; each has its own
+    timeout and a slow or failing source only empties its own section.
+    Returns {tier: (data, partial)}.
+    """
+    started = time.monotonic()
+    futures = {
+        (tier, source): _catalog_executor.submit(fetch, conn, project_id)
+        for tier in tiers
+        for source, fetch in TIER_SOURCES[tier].items()
+    }
+
+    results = {tier: ({}, []) for tier in tiers}
+    for (tier, source), future in futures.items():
+        data, partial = results[tier]
+        timeout = max(_source_timeout(source) - (time.monotonic() - started), 0)
+        try:
+            data[source] = future.result(timeout=timeout)
+        except FutureTimeout:
+            logger.warning(f"[catalog] Timed out fetching {tier} {source}")
+            data[source] = []
+            partial.append(_section(source))
+        except Exception as e:
+            logger.warning(f"[catalog] Failed to fetch {tier} {source}: {e}")
+            data[source] = []
+            partial.append(_section(source))
+    return results
+
+
+def _etag(data):
+    return hashlib.sha1(encode(data, serializer="json", compression="none")).hexdigest()
+
+
+def _store_tier(key, data, partial, ttl):
+    now = time.time()
+    tier = {
+        **data,
+        "partial": partial,
+        "etag": _etag(data),
+        "fetched_at": now,
+        "checked_at": now,
+    }
+    # Partial tiers are kept for a minute only so the missing sections heal soon
+    cache_set(key, tier, ex=60 if partial else ttl)
+    return tier
+
+
+def _store_public(data, partial):
+    return _store_tier(PUBLIC_CATALOG_KEY, data, partial, getattr(settings, "CATALOG_PUBLIC_TTL", 3600))
+
+
+def _store_project(project_id, data, partial):
+    seen = set()
+    images = data.pop("owned_images") + data.pop("shared_images")
+    data["images"] = [img for img in images if not (img["id"] in seen or seen.add(img["id"]))]
+    return _store_tier(
+        project_catalog_key(project_id), data, sorted(set(partial)), getattr(settings, "CATALOG_PROJECT_TTL", 3000)
+    )
+
+
+@single_flight(key_args=(), ttl=60, join_timeout=30, on_join=lambda conn: cache_get(PUBLIC_CATALOG_KEY))
+def refresh_public_catalog(conn):
+    results = _fan_out(conn, None, ("public",))
+    return _store_public(*results["public"])
+
+
+@single_flight(
+    key_args=("project_id",), ttl=60, join_timeout=30,
+    on_join=lambda conn, project_id: cache_get(project_catalog_key(project_id)),
+)
+def refresh_project_catalog(conn, project_id):
+    results = _fan_out(conn, project_id, ("project",))
+    return _store_project(project_id, *results["project"])
+
+
+@single_flight(
+    key_args=("project_id",), ttl=60, join_timeout=30,
+    on_join=lambda conn, project_id: (cache_get(PUBLIC_CATALOG_KEY), cache_get(project_catalog_key(project_id))),
+)
+def refresh_catalogs(conn, project_id):
+    """
+    Cold start: fetch both tiers in one fan-out, so the latency is that of
+    the slowest single source. Returns (public, project).
+    """
+    results = _fan_out(conn, project_id, ("public", "project"))
+    return _store_public(*results["public"]), _store_project(project_id, *results["project"])
+
+
+def needs_revalidation(public):
+    interval = getattr(settings, "CATALOG_REVALIDATE_INTERVAL", 300)
+    return time.time() - public.get("checked_at", 0) > interval
+
+
+@single_flight(key_args=(), ttl=30)
+def revalidate_public_catalog(conn, public):
+    """
+    Ask Glance whether any public image changed since the newest one we hold.
+    Only a change triggers the full public refresh; otherwise the tier is
+    just marked as checked. Returns None if another revalidation is running.
+    """
+    last_seen = max((img.get("updated_at") or "" for img in public.get("images", [])), default="")
+    params = {"visibility": "public", "limit": 1}
+    if last_seen:
+        params["updated_at"] = f"gt:{last_seen}"
+
+    response = conn.image.get("/images", params=params)
+    response.raise_for_status()
+    if response.json().get("images"):
+        return refresh_public_catalog(conn)
+
+    public["checked_at"] = time.time()
+    cache_set(PUBLIC_CATALOG_KEY, public, ex=max(
+        int(public["fetched_at"] + getattr(settings, "CATALOG_PUBLIC_TTL", 3600) - time.time()), 1
+    ))
+    return public
+
+
+def merge_catalogs(public, project, project_id):
+    """
+    Build the instance options payload from both tiers.
+    """
+    images = {
+        "distribution": [],
+        "marketplace": [],
+        "my_images": [],
+        "iso": []
+    }
+    seen = set()
+    for img in public.get("images", []) + project.get("images", []):
+        if img["id"] in seen:
+            continue
+        seen.add(img["id"])
+
+        name = (img["name"] or "").lower()
+        entry = {"id": img["id"], "name": img["name"]}
+
+        if "ubuntu" in name or "centos" in name:
+            images["distribution"].append(entry)
+        elif "win" in name or "market" in name:
+            images["marketplace"].append(entry)
+        elif "iso" in name or img["disk_format"] == "iso":
+            images["iso"].append(entry)
+        elif img["owner_id"] == project_id:
+            images["my_images"].append(entry)
+
+    plans, seen = [], set()
+    for flavor in public.get("flavors", []) + project.get("flavors", []):
+        if flavor["id"] not in seen:
+            seen.add(flavor["id"])
+            plans.append(flavor)
+
+    options = {
+        "regions": public.get("regions", []),
+        "plans": plans,
+        "images": images,
+        "networks": project.get("networks", []),
+    }
+
+    partial = public.get("partial", []) + project.get("partial", [])
+    if partial:
+        options["partial"] = partial
+    return options
+
+
+def combined_etag(public, project):
+    return hashlib.sha1(f"{public.get('etag')}:{project.get('etag')}".encode()).hexdigest()
@@ -1,4 +1,12 @@
+from django.conf import settings
+
+from utils.async_http import aget_json
 from utils.conn import connect_with_token
+from utils.uploads import iter_chunks
+
+# Query parameters passed through to Glance by the image/snapshot list views
+IMAGE_FILTERS = ("visibility", "owner", "status", "image_type", "instance_uuid", "disk_format", "name")
+
 
 def get_valid_token(redis_client, username: str, project_id: str):
     redis_key = f"keystone_token:{username}:{project_id}"
@@ -8,48 +16,145 @@ def get_valid_token(redis_client, username: str, project_id: str):
     return token.decode() if isinstance(token, bytes) else token
 
 
-def list_all_images(token: str, project_id: str):
+def _get_image_page(conn, params):
+    response = conn.image.get("/images", params=params)
+    response.raise_for_status()
+    return response.json()
+
+
+def iter_images(conn, page_size=None, **filters):
+    """
+    Lazily iterate raw Glance image dicts matching ``filters``.
+
+    Filters are sent to Glance as query parameters (visibility, owner, status,
+    custom properties such as image_type or instance_uuid, ...) and pages are
+    followed with markers. The first page is fetched before returning, so
+    connection and auth errors are raised here rather than while iterating.
+    """
+    params = {key: value for key, value in filters.items() if value is not None}
+    params["limit"] = page_size or getattr(settings, "GLANCE_PAGE_SIZE", 200)
+    first = _get_image_page(conn, params)
+
+    def images():
+        page = first
+        while True:
+            items = page.get("images", [])
+            yield from items
+            if not page.get("next") or not items:
+                return
+            page = _get_image_page(conn, {**params, "marker": items[-1]["id"]})
+
+    return images()
+
+
+def list_all_images(token: str, project_id: str, **filters):
     conn = connect_with_token(token, project_id)
-    images = conn.image.images()
-
-    result = []
-    for image in images:
-        props = getattr(image, "properties", {}) or {}
-        image_type = props.get("image_type", "image")
-        result.append({
-            "id": image.id,
-            "name": image.name,
-            "size": image.size,
-            "status": image.status,
-            "created_at": image.created_at,
-            "visibility": image.visibility,
-            "disk_format": image.disk_format,
-            "os_type": props.get("os_type", "-"),
-            "image_type": image_type,
-        })
-    return result
-
-
-def list_snapshots(token: str, project_id: str):
+
+    return (
+        {
+            "id": image["id"],
+            "name": image.get("name"),
+            "size": image.get("size"),
+            "status": image.get("status"),
+            "created_at": image.get("created_at"),
+            "visibility": image.get("visibility"),
+            "disk_format": image.get("disk_format"),
+            "os_type": image.get("os_type", "-"),
+            "image_type": image.get("image_type", "image"),
+        }
+        for image in iter_images(conn, **filters)
+    )
+
+
+def list_snapshots(token: str, project_id: str, marker=None, page_size=None, **filters):
     conn = connect_with_token(token, project_id)
-    images = conn.image.images()
-
-    snapshots = []
-    for img in images:
-        props = getattr(img, "properties", {}) or {}
-        is_snapshot = (
-            props.get("image_type") == "snapshot" or
-            props.get("instance_snapshot") == "true"
-        )
-        if not is_snapshot:
-            continue
-
-        snapshots.append({
-            "id": img.id,
-            "name": img.name,
-            "size": img.size,
-            "status": img.status,
-            "created_at": img.created_at,
-            "instance_id": props.get("instance_uuid"),
-        })
-    return snapshots
+
+    # Glance cannot OR two properties, so snapshots tagged only with the
+    # legacy instance_snapshot=true flag come from a second filtered query
+    # that runs after the first one is exhausted.
+    filters.pop("image_type", None)
+    in_legacy_phase = False
+    if marker:
+        response = conn.image.get(f"/images/{marker}")
+        response.raise_for_status()
+        in_legacy_phase = response.json().get("image_type") != "snapshot"
+
+    def snapshots():
+        if not in_legacy_phase:
+            yield from iter_images(conn, page_size, image_type="snapshot", marker=marker, **filters)
+        legacy_marker = marker if in_legacy_phase else None
+        for img in iter_images(conn, page_size, instance_snapshot="true", marker=legacy_marker, **filters):
+            # Already returned by the image_type query
+            if img.get("image_type") != "snapshot":
+                yield img
+
+    return (
+        {
+            "id": img["id"],
+            "name": img.get("name"),
+            "size": img.get("size"),
+            "status": img.get("status"),
+            "created_at": img.get("created_at"),
+            "instance_id": img.get("instance_uuid"),
+        }
+        for img in snapshots()
+    )
+
+
+async def aiter_images(token: str, page_size=None, **filters):
+    """
+    Async counterpart of iter_images against OPENSTACK_IMAGE_URL.
+    """
+    url = f"{settings.OPENSTACK_IMAGE_URL}/v2/images"
+    params = {key: value for key, value in filters.items() if value is not None}
+    params["limit"] = page_size or getattr(settings, "GLANCE_PAGE_SIZE", 200)
+    while True:
+        page = await aget_json(url, token, params=params)
+        items = page.get("images", [])
+        for image in items:
+            yield image
+        if not page.get("next") or not items:
+            return
+        params = {**params, "marker": items[-1]["id"]}
+
+
+class ChecksumMismatch(Exception):
+    """Glance stored different checksums than the uploaded file had."""
+
+
+def checksum_mismatch(image, checksums):
+    """
+    Compare the checksums computed while receiving an upload with what Glance
+    stored. Returns an error message, or None if they match (or are unknown).
+    """
+    if not checksums:
+        return None
+    if image.get("checksum") and image["checksum"] != checksums["md5"]:
+        return f"Checksum mismatch: Glance stored {image['checksum']}, uploaded {checksums['md5']}"
+    if image.get("os_hash_algo") == "sha512" and image.get("os_hash_value") != checksums["sha512"]:
+        return "Checksum mismatch: Glance stored a different sha512 hash"
+    return None
+
+
+def upload_image_file(conn, image_id: str, file):
+    """
+    Stream a spooled upload to Glance in chunks and verify its checksums.
+    Returns the stored image dict. On a checksum mismatch the corrupt image is
+    deleted and ChecksumMismatch is raised.
+    """
+    response = conn.image.put(
+        f"/images/{image_id}/file",
+        data=iter_chunks(file),
+        headers={"Content-Type": "application/octet-stream"},
+    )
+    response.raise_for_status()
+
+    response = conn.image.get(f"/images/{image_id}")
+    response.raise_for_status()
+    image = response.json()
+
+    error = checksum_mismatch(image, getattr(file, "checksums", None))
+    if error:
+        conn.image.delete_image(image_id, ignore_missing=True)
+        raise ChecksumMismatch(error)
+    return image
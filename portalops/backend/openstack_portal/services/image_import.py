@@ -0,0 +1,170 @@
+"""
+Resumable image import jobs.
+
+The client creates a job with the expected size, then uploads the image in
+chunks at increasing offsets into IMAGE_IMPORT_STAGING_DIR. A lost chunk is
+resumed by reading the job's ``received`` offset and continuing from there.
+Once every byte is staged, import_image_job (celery) streams the file to
+Glance. Job state lives in the ``image_import:<job_id>`` Redis hash:
+
+    status      uploading -> queued -> importing -> active | failed
+    received    bytes staged so far
+    sent        bytes streamed to Glance so far
+"""
+import hashlib
+import os
+import time
+import uuid
+
+from django.conf import settings
+
+from utils.redis_client import redis_client
+from utils.uploads import iter_chunks
+
+UPLOADING = "uploading"
+QUEUED = "queued"
+IMPORTING = "importing"
+ACTIVE = "active"
+FAILED = "failed"
+
+
+class ImportConflict(ValueError):
+    """The chunk does not continue the staged file, or the job is not accepting chunks."""
+
+
+def job_key(job_id: str) -> str:
+    return f"image_import:{job_id}"
+
+
+def staging_path(job_id: str) -> str:
+    return os.path.join(settings.IMAGE_IMPORT_STAGING_DIR, f"{job_id}.part")
+
+
+def update_job(job_id, **fields):
+    fields["updated_at"] = time.time()
+    key = job_key(job_id)
+    with redis_client.pipeline() as pipe:
+        pipe.hset(key, mapping={k: "" if v is None else v for k, v in fields.items()})
+        pipe.expire(key, settings.IMAGE_IMPORT_JOB_TTL)
+        pipe.execute()
+
+
+def create_job(username, project_id, name, disk_format, visibility, size):
+    job_id = uuid.uuid4().hex
+    os.makedirs(settings.IMAGE_IMPORT_STAGING_DIR, exist_ok=True)
+    open(staging_path(job_id), "wb").close()
+
+    update_job(
+        job_id,
+        username=username,
+        project_id=project_id,
+        name=name,
+        disk_format=disk_format,
+        visibility=visibility,
+        size=size,
+        received=0,
+        sent=0,
+        status=UPLOADING,
+        image_id=None,
+        error=None,
+        created_at=time.time(),
+    )
+    return get_job(job_id)
+
+
+def get_job(job_id: str):
+    job = redis_client.hgetall(job_key(job_id))
+    if not job:
+        return None
+    for field in ("size", "received", "sent"):
+        job[field] = int(job[field])
+    job["id"] = job_id
+    job["image_id"] = job["image_id"] or None
+    job["error"] = job["error"] or None
+    return job
+
+
+def append_chunk(job, offset: int, chunk):
+    """
+    Write ``chunk`` (an uploaded file) at ``offset``, which must equal the
+    number of bytes already staged. Returns the updated job.
+    """
+    job_id = job["id"]
+    lock = redis_client.lock(f"{job_key(job_id)}:lock", timeout=settings.IMAGE_IMPORT_CHUNK_TIMEOUT)
+    if not lock.acquire(blocking=False):
+        raise ImportConflict("Another chunk for this job is being written.")
+
+    try:
+        job = get_job(job_id)
+        if job["status"] != UPLOADING:
+            raise ImportConflict(f"Job is {job['status']}, not accepting chunks.")
+
+        path = staging_path(job_id)
+        # The staged file is the source of truth for the resume offset
+        received = os.path.getsize(path)
+        if offset != received:
+            raise ImportConflict(f"Expected offset {received}, got {offset}.")
+        if received + chunk.size > job["size"]:
+            raise ImportConflict("Chunk extends past the declared image size.")
+
+        with open(path, "ab") as staged:
+            for data in iter_chunks(chunk):
+                staged.write(data)
+            received = staged.tell()
+
+        status = QUEUED if received == job["size"] else UPLOADING
+        update_job(job_id, received=received, status=status)
+    finally:
+        lock.release()
+
+    return get_job(job_id)
+
+
+def fail_job(job_id: str, error: str):
+    update_job(job_id, status=FAILED, error=error)
+
+
+def delete_job(job_id: str):
+    redis_client.delete(job_key(job_id))
+    try:
+        os.remove(staging_path(job_id))
+    except FileNotFoundError:
+        pass
+
+
+def stream_staged_file(job_id: str, checksums: dict):
+    """
+    Yield the staged file chunk by chunk, hashing it and recording progress
+    in the job as it goes. ``checksums`` is filled in once the file is read.
+    """
+    md5, sha512 = hashlib.md5(), hashlib.sha512()
+    sent = 0
+    with open(staging_path(job_id), "rb") as staged:
+        for data in iter_chunks(staged):
+            md5.update(data)
+            sha512.update(data)
+            sent += len(data)
+            redis_client.hset(job_key(job_id), "sent", sent)
+            yield data
+    checksums.update(md5=md5.hexdigest(), sha512=sha512.hexdigest())
+
+
+def cleanup_staging():
+    """
+    Remove staged files whose job has expired. Returns the number removed.
+    """
+    removed = 0
+    staging_dir = settings.IMAGE_IMPORT_STAGING_DIR
+    if not os.path.isdir(staging_dir):
+        return removed
+
+    for filename in os.listdir(staging_dir):
+        job_id, ext = os.path.splitext(filename)
+        if ext != ".part" or redis_client.exists(job_key(job_id)):
+            continue
+        try:
+            os.remove(os.path.join(staging_dir, filename))
+            removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
@@ -0,0 +1,214 @@
+"""
+Nova helpers: the process-wide flavor map of the admin views and the VPS
+detail aggregation.
+
+The detail page needs the server, its flavor and image, its volumes and its
+snapshots. The Glance snapshot query runs concurrently with the server
+lookup; flavor, image and the attached volumes are fetched concurrently once
+the server is known. All calls go through the shared async HTTP client. The
+result is cached briefly per instance and dropped by overview.events whenever
+the instance changes.
+"""
+import asyncio
+import logging
+
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from utils.async_http import aget_json, alist_pages
+from utils.pagination import iter_pages
+from utils.redis_client import redis_client, cache_get, cache_set
+from utils.ttl_cache import TTLCache
+from .glance import aiter_images
+
+logger = logging.getLogger(__name__)
+
+# Microversion 2.47 embeds the flavor in the server, saving a Nova round trip
+COMPUTE_MICROVERSION = {"OpenStack-API-Version": "compute 2.47"}
+
+# Process-wide map of all flavors (public and private) for the admin views.
+# Flavors rarely change, so one listing per FLAVOR_MAP_CACHE_TTL is enough.
+_flavor_map_cache = TTLCache(maxsize=1, ttl=getattr(settings, "FLAVOR_MAP_CACHE_TTL", 600))
+
+FLAVOR_LIST_PARAMS = {"is_public": "None"}
+
+
+class InstanceNotFound(Exception):
+    pass
+
+
+def build_flavor_map(flavors):
+    """
+    Raw Nova flavor dicts keyed by id and by name.
+    """
+    flavor_map = {str(f["id"]): f for f in flavors}
+    flavor_map.update({str(f["name"]): f for f in flavors})
+    return flavor_map
+
+
+def get_flavor_map(conn):
+    flavor_map = _flavor_map_cache.get("all")
+    if flavor_map is None:
+        flavors = iter_pages(conn.compute, "/flavors/detail", "flavors", FLAVOR_LIST_PARAMS)
+        flavor_map = build_flavor_map(list(flavors))
+        _flavor_map_cache.set("all", flavor_map)
+    return flavor_map
+
+
+async def aget_flavor_map(token):
+    flavor_map = _flavor_map_cache.get("all")
+    if flavor_map is None:
+        flavors = await alist_pages(
+            f"{settings.OPENSTACK_COMPUTE_URL}/flavors/detail", token, "flavors", FLAVOR_LIST_PARAMS
+        )
+        flavor_map = build_flavor_map(flavors)
+        _flavor_map_cache.set("all", flavor_map)
+    return flavor_map
+
+
+def vps_detail_cache_key(project_id, instance_id):
+    return f"vps_detail:{project_id}:{instance_id}"
+
+
+def invalidate_vps_detail(project_id, instance_id):
+    # Called after the instance changed; the entry expires on its own anyway
+    try:
+        redis_client.delete(vps_detail_cache_key(project_id, instance_id))
+    except Exception as e:
+        logger.warning(f"Failed to invalidate VPS detail of {instance_id}: {e}")
+
+
+async def _volume(token, volume_id):
+    # A volume being detached or deleted must not hide the server
+    try:
+        body = await aget_json(f"{settings.OPENSTACK_BLOCK_STORAGE_URL}/volumes/{volume_id}", token)
+    except Exception:
+        return {"id": volume_id, "name": None, "size": None, "status": "unknown"}
+    vol = body.get("volume", {})
+    return {
+        "id": vol.get("id"),
+        "name": vol.get("name"),
+        "size": f"{vol.get('size')} GB",
+        "status": vol.get("status")
+    }
+
+
+async def _snapshots(token, instance_id):
+    return [
+        {
+            "id": img["id"],
+            "name": img.get("name") or img["id"],
+            "size": f"{(img.get('size') or 0) / (1024 ** 3):.2f} GB",
+            "created_at": img.get("created_at")
+        }
+        async for img in aiter_images(token, image_type="snapshot", instance_uuid=instance_id)
+    ]
+
+
+async def _flavor(token, project_id, flavor_ref):
+    if "vcpus" in flavor_ref:
+        return flavor_ref
+
+    flavors = await sync_to_async(cache_get, thread_sensitive=False)(f"flavors_cache:{project_id}")
+    cached = (flavors or {}).get(flavor_ref.get("id"))
+    if cached:
+        return cached
+
+    try:
+        body = await aget_json(f"{settings.OPENSTACK_COMPUTE_URL}/flavors/{flavor_ref.get('id')}", token)
+    except Exception:
+        return None
+    flavor = body.get("flavor", {})
+    return {"vcpus": flavor.get("vcpus"), "ram": flavor.get("ram"), "disk": flavor.get("disk")}
+
+
+async def _image_name(token, image_ref):
+    # Servers booted from volume have no image
+    if not image_ref or not image_ref.get("id"):
+        return None
+    try:
+        body = await aget_json(f"{settings.OPENSTACK_IMAGE_URL}/v2/images/{image_ref['id']}", token)
+    except Exception:
+        return None
+    return body.get("name")
+
+
+async def aget_vps_detail(token, project_id, instance_id):
+    """
+    Detail payload of one instance; None if its flavor cannot be found.
+    Raises InstanceNotFound if Nova does not know the instance.
+    """
+    cache_key = vps_detail_cache_key(project_id, instance_id)
+    cached = await sync_to_async(cache_get, thread_sensitive=False)(cache_key)
+    if cached is not None:
+        return cached
+
+    snapshots_task = asyncio.ensure_future(_snapshots(token, instance_id))
+    try:
+        body = await aget_json(
+            f"{settings.OPENSTACK_COMPUTE_URL}/servers/{instance_id}", token, headers=COMPUTE_MICROVERSION
+        )
+    except httpx.HTTPStatusError as e:
+        snapshots_task.cancel()
+        if e.response.status_code == 404:
+            raise InstanceNotFound(instance_id) from e
+        raise
+    except Exception:
+        snapshots_task.cancel()
+        raise
+    instance = body["server"]
+
+    attached = instance.get("os-extended-volumes:volumes_attached") or []
+    flavor, image_name, snapshots, *volumes = await asyncio.gather(
+        _flavor(token, project_id, instance.get("flavor") or {}),
+        _image_name(token, instance.get("image")),
+        snapshots_task,
+        *(_volume(token, vol["id"]) for vol in attached),
+    )
+    if not flavor:
+        return None
+
+    # Network info
+    private_ip, floating_ip, mac_address, subnet = "", "", "", ""
+    for net in (instance.get("addresses") or {}).values():
+        for addr in net:
+            if addr.get("OS-EXT-IPS:type") == "floating":
+                floating_ip = addr["addr"]
+            elif addr.get("OS-EXT-IPS:type") == "fixed":
+                private_ip = addr["addr"]
+                mac_address = addr.get("OS-EXT-IPS-MAC:mac_addr", "")
+                subnet = addr.get("subnet", "")
+
+    data = {
+        "id": instance["id"],
+        "name": instance.get("name"),
+        "status": instance.get("status"),
+        "ip": floating_ip or private_ip,
+        "cpu": f"{flavor['vcpus']} vCPU",
+        "ram": f"{flavor['ram'] / 1024:.1f} GB",
+        "disk": f"{flavor['disk']} GB",
+        "os": image_name or "Custom Image",
+        "datacenter": instance.get("OS-EXT-AZ:availability_zone"),
+        "created_at": instance.get("created"),
+
+        "monitoring": {
+            "cpu_usage": 55,  # Placeholder
+            "ram_usage": 72,
+            "disk_usage": 40
+        },
+
+        "snapshots": snapshots,
+        "volumes": volumes,
+        "network": {
+            "floating_ip": floating_ip,
+            "private_ip": private_ip,
+            "mac_address": mac_address,
+            "subnet": subnet or "192.168.1.0/24"  # fallback
+        }
+    }
+
+    await sync_to_async(cache_set, thread_sensitive=False)(
+        cache_key, data, ex=getattr(settings, "VPS_DETAIL_CACHE_TTL", 15)
+    )
+    return data
@@ -1,11 +1,25 @@
-import json
 import logging
+import os
 from typing import Dict
 
 from celery import shared_task
 
+from django.conf import settings
+
 from utils.conn import connect_with_token
-from utils.redis_client import redis_client
+from utils.redis_client import cache_get, redis_client
+from .services import image_import
+from .services.glance import checksum_mismatch, get_valid_token
+from .services.catalog import (
+    PUBLIC_CATALOG_KEY,
+    merge_catalogs,
+    needs_revalidation,
+    project_catalog_key,
+    refresh_catalogs,
+    refresh_project_catalog,
+    refresh_public_catalog,
+    revalidate_public_catalog,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -13,7 +27,11 @@ logger = logging.getLogger(__name__)
 @shared_task
 def fetch_and_cache_instance_options(username: str, token: str, project_id: str) -> Dict:
     """
-    Fetch and cache instance options (regions, flavors, images, networks) from OpenStack.
+    Fetch instance options (regions, flavors, images, networks) from OpenStack.
+
+    The public catalog tier is shared by all users and only refetched when it is
+    missing or Glance reports a change; the project tier is cached per project.
+    Both are merged into the response.
 
     Args:
         username (str): Authenticated user's username
@@ -34,70 +52,97 @@ def fetch_and_cache_instance_options(username: str, token: str, project_id: str)
         logger.error(error_msg)
         return {"error": error_msg}
 
-    # 1. Availability Zones / Regions
     try:
-        az_list = conn.compute.availability_zones()
-        regions = [az.name for az in az_list if az.state.get('available', False)]
+        public = cache_get(PUBLIC_CATALOG_KEY)
+        project = cache_get(project_catalog_key(project_id))
+
+        if public is None and project is None:
+            # Cold cache: both tiers in one concurrent fan-out
+            public, project = refresh_catalogs(conn, project_id)
+        elif public is None:
+            public = refresh_public_catalog(conn)
+        elif needs_revalidation(public):
+            try:
+                public = revalidate_public_catalog(conn, public) or public
+            except Exception as e:
+                logger.warning(f"[{username}] Public catalog revalidation failed: {e}")
+
+        if project is None:
+            project = refresh_project_catalog(conn, project_id)
     except Exception as e:
-        logger.warning(f"[{username}] Failed to fetch availability zones: {e}")
-        regions = []
-
-    # 2. Images
-    images = {
-        "distribution": [],
-        "marketplace": [],
-        "my_images": [],
-        "iso": []
-    }
-    try:
-        for img in conn.image.images():
-            name = (img.name or "").lower()
-            entry = {"id": img.id, "name": img.name}
-
-            if "ubuntu" in name or "centos" in name:
-                images["distribution"].append(entry)
-            elif "win" in name or "market" in name:
-                images["marketplace"].append(entry)
-            elif "iso" in name or img.disk_format == "iso":
-                images["iso"].append(entry)
-            elif img.owner_id == project_id:
-                images["my_images"].append(entry)
-    except Exception as e:
-        logger.warning(f"[{username}] Failed to fetch images: {e}")
+        logger.error(f"[{username}] Failed to cache instance options: {e}")
+        return {"error": f"Failed to cache instance options: {str(e)}"}
+
+    if public is None or project is None:
+        return {"error": "Instance options are still being fetched. Please retry."}
+
+    return merge_catalogs(public, project, project_id)
 
-    # 3. Flavors (Plans)
-    plans = []
-    try:
-        for flavor in conn.compute.flavors():
-            plans.append({
-                "id": flavor.id,
-                "label": f"{flavor.name} - {flavor.vcpus} CPU, {flavor.ram}MB RAM, {flavor.disk}GB SSD"
-            })
-    except Exception as e:
-        logger.warning(f"[{username}] Failed to fetch flavors: {e}")
 
-    # 4. Networks
-    networks = []
+@shared_task(bind=True)
+def import_image_job(self, job_id: str):
+    """
+    Stream a fully staged image import job to Glance.
+
+    Transient failures are retried from the staged file up to
+    IMAGE_IMPORT_MAX_RETRIES times; the image created by a failed attempt is
+    deleted first. The staged file is removed once the image is active.
+    """
+    job = image_import.get_job(job_id)
+    if job is None or job["status"] not in (image_import.QUEUED, image_import.IMPORTING):
+        return None
+
     try:
-        for net in conn.network.networks():
-            networks.append({"id": net.id, "name": net.name})
+        token = get_valid_token(redis_client, job["username"], job["project_id"])
+        conn = connect_with_token(token, job["project_id"])
     except Exception as e:
-        logger.warning(f"[{username}] Failed to fetch networks: {e}")
-
-    # Final structure
-    data_to_cache = {
-        "regions": regions,
-        "plans": plans,
-        "images": images,
-        "networks": networks,
-    }
+        image_import.fail_job(job_id, str(e))
+        return None
 
-    redis_key = f"instance_options:{username}:{project_id}"
     try:
-        redis_client.set(redis_key, json.dumps(data_to_cache), ex=3000)  #50 minutes
-        logger.info(f"[{username}] Cached instance options under key: {redis_key}")
+        if job["image_id"]:
+            conn.image.delete_image(job["image_id"], ignore_missing=True)
+
+        image = conn.image.create_image(
+            name=job["name"],
+            disk_format=job["disk_format"],
+            container_format="bare",
+            visibility=job["visibility"],
+        )
+        image_import.update_job(job_id, status=image_import.IMPORTING, image_id=image.id, sent=0, error=None)
+
+        checksums = {}
+        response = conn.image.put(
+            f"/images/{image.id}/file",
+            data=image_import.stream_staged_file(job_id, checksums),
+            headers={"Content-Type": "application/octet-stream"},
+        )
+        response.raise_for_status()
+
+        response = conn.image.get(f"/images/{image.id}")
+        response.raise_for_status()
+        error = checksum_mismatch(response.json(), checksums)
+        if error:
+            conn.image.delete_image(image.id, ignore_missing=True)
+            image_import.fail_job(job_id, error)
+            return None
     except Exception as e:
-        logger.error(f"[{username}] Failed to cache instance options: {e}")
-        return {"error": f"Failed to cache instance options: {str(e)}"}
+        if self.request.retries < settings.IMAGE_IMPORT_MAX_RETRIES:
+            logger.warning(f"Image import {job_id} failed, retrying: {e}")
+            image_import.update_job(job_id, error=str(e))
+            raise self.retry(exc=e, countdown=settings.IMAGE_IMPORT_RETRY_DELAY)
+        logger.error(f"Image import {job_id} failed: {e}")
+        image_import.fail_job(job_id, str(e))
+        return None
+
+    image_import.update_job(job_id, status=image_import.ACTIVE, checksum=checksums["md5"])
+    try:
+        os.remove(image_import.staging_path(job_id))
+    except FileNotFoundError:
+        pass
+    return image.id
 
-    return data_to_cache
+
+@shared_task
+def cleanup_image_import_staging():
+    return image_import.cleanup_staging()
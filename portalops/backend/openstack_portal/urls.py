@@ -1,7 +1,7 @@
 from django.urls import path
 
 from .views.cinder import VolumeAPI
-from .views.glance import ListImagesView, SnapshotListAPIView
+from .views.glance import ListImagesView, SnapshotListAPIView, ImageImportView, ImageImportDetailView
 from .views.neutron import PortListView, FloatingIPListView, AttachFloatingIPView, NetworkListView, CreateNetworkView, \
     SubnetListView, AssignOrReplaceFloatingIPView, RemovingFloatingIPView, CreateNetworkAPI, AddingFloatingIPView, \
     ListAllIPView, GetVMIPsView, ChangePasswordVMView
@@ -21,6 +21,8 @@ urlpatterns = [
     path("compute/instances/<str:id>/action/", InstanceActionAPI.as_view()),
     path('compute/instances/<str:instance_id>/snapshot/', InstanceSnapshotView.as_view(), name='instance-snapshot'),
     path("image/images/", ListImagesView.as_view(), name="list-images"),
+    path("image/imports/", ImageImportView.as_view(), name="image-import"),
+    path("image/imports/<str:job_id>/", ImageImportDetailView.as_view(), name="image-import-detail"),
     path('image/instance-snapshots/', SnapshotListAPIView.as_view(), name='snapshot-list'),
     path('network/<str:network_id>/ports/', PortListView.as_view(), name='network-port-list'),
     path('network/floatingip-list/', FloatingIPListView.as_view(), name='floating-ip-list'),
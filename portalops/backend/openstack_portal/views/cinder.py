@@ -1,8 +1,18 @@
+import logging
+
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from overview.limits import invalidate_limits
+from overview.summary import adjust_system_summary
 from utils.conn import connect_with_token  # thay thế bằng path helper thực tế
 from utils.redis_client import redis_client  # thay thế bằng thực thể Redis bạn đang dùng
+from utils.pagination import InvalidPageParams, PageParams, iter_pages, next_marker
+
+logger = logging.getLogger(__name__)
+
+# Cinder list filters accepted from the query string
+VOLUME_FILTERS = ("name", "status", "bootable", "availability_zone", "volume_type")
 
 class VolumeAPI(APIView):
     permission_classes = [IsAuthenticated]
@@ -22,54 +32,78 @@ class VolumeAPI(APIView):
 
         return token, project_id, None
 
+    @staticmethod
+    def _volume_row(vol):
+        image_meta = vol.get("volume_image_metadata")
+
+        if vol.get("snapshot_id"):
+            source_type = "snapshot"
+            source_id = vol["snapshot_id"]
+        elif image_meta:
+            source_type = "image"
+            source_id = image_meta.get("image_id")
+        elif vol.get("source_volid"):
+            source_type = "volume"
+            source_id = vol["source_volid"]
+        else:
+            source_type = "manual"
+            source_id = None
+
+        return {
+            "id": vol["id"],
+            "name": vol.get("name"),
+            "type": vol.get("volume_type"),
+            "source_type": source_type,
+            "source_id": source_id,
+            "size": vol.get("size"),
+            "status": vol.get("status"),
+            "created_at": vol.get("created_at"),
+            "description": vol.get("description") or "",
+        }
+
     def get(self, request):
+        """
+        Rows come straight from one /volumes/detail page. The cursor maps to
+        Cinder's ``marker``; ``sort`` and the filters in VOLUME_FILTERS are
+        passed through to Cinder.
+        """
         token, project_id, error = self.get_token(request)
         if error:
             return error
 
         try:
-            conn = connect_with_token(token, project_id)
-            volumes = conn.block_storage.volumes(details=True)
-
-            result = []
-            for vol in volumes:
-                detailed_vol = conn.block_storage.get_volume(vol.id)
-
-                snapshot_id = getattr(detailed_vol, "snapshot_id", None)
-                image_meta = getattr(detailed_vol, "volume_image_metadata", None)
-                source_volid = getattr(detailed_vol, "source_volid", None)
-
-                if snapshot_id:
-                    source_type = "snapshot"
-                    source_id = snapshot_id
-                elif image_meta:
-                    source_type = "image"
-                    source_id = detailed_vol.volume_image_metadata.get(
-                        'image_id') if detailed_vol.volume_image_metadata else None
-                elif source_volid:
-                    source_type = "volume"
-                    source_id = source_volid
-                else:
-                    source_type = "manual"
-                    source_id = None
-
-                result.append({
-                    "id": detailed_vol.id,
-                    "name": detailed_vol.name,
-                    "type": detailed_vol.volume_type,
-                    "source_type": source_type,
-                    "source_id": source_id,
-                    "size": detailed_vol.size,
-                    "status": detailed_vol.status,
-                    "created_at": detailed_vol.created_at,
-                    "description": detailed_vol.description or "",
-                })
-
-            return Response(result)
+            page_params = PageParams(request)
+        except InvalidPageParams as e:
+            return Response({"error": str(e)}, status=400)
+
+        params = {
+            key: request.query_params[key]
+            for key in ("sort", *VOLUME_FILTERS)
+            if request.query_params.get(key)
+        }
+        if page_params.after:
+            params["marker"] = page_params.after
 
+        try:
+            conn = connect_with_token(token, project_id)
+            if page_params.limit is None:
+                # Unpaginated request: follow Cinder's pages to the end
+                volumes, next_after = list(iter_pages(conn.block_storage, "/volumes/detail", "volumes", params)), None
+            else:
+                page = self._get_page(conn, {**params, "limit": page_params.limit})
+                volumes, next_after = page.get("volumes", []), next_marker(page.get("volumes_links"))
         except Exception as e:
             return Response({"error": str(e)}, status=500)
 
+        rows = (self._volume_row(vol) for vol in volumes)
+        return page_params.response(rows, next_after)
+
+    @staticmethod
+    def _get_page(conn, params):
+        response = conn.block_storage.get("/volumes/detail", params=params)
+        response.raise_for_status()
+        return response.json()
+
     def post(self, request):
         token, project_id, error = self.get_token(request)
         if error:
@@ -108,6 +142,12 @@ class VolumeAPI(APIView):
                 create_kwargs["snapshot_id"] = source_snapshot
 
             volume = conn.block_storage.create_volume(**create_kwargs)
+            try:
+                adjust_system_summary(project_id, volumes=1, storage_gb=int(volume.size or size))
+            except Exception as e:
+                # The volume exists; a retry on 500 would create a duplicate
+                logger.warning(f"Failed to count volume {volume.id} in the system summary: {e}")
+            invalidate_limits(project_id)
 
             return Response({
                 "id": volume.id,
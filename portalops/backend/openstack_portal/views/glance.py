@@ -1,13 +1,18 @@
+from django.conf import settings
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from utils.redis_client import redis_client
 
-from ..services.glance import get_valid_token, list_all_images, list_snapshots
+from ..services import image_import
+from ..services.glance import IMAGE_FILTERS, ChecksumMismatch, get_valid_token, list_all_images, list_snapshots, upload_image_file
+from utils.pagination import InvalidPageParams, PageParams, marker_page
 from utils.conn import connect_with_token_v5
+from utils.uploads import SpooledUploadMixin
 
 from userauth.permissions import IsAdmin
+from ..tasks import import_image_job
 
 
 class ListImagesView(APIView):
@@ -22,8 +27,15 @@ class ListImagesView(APIView):
 
         try:
             token = get_valid_token(redis_client, username, project_id)
-            result = list_all_images(token, project_id)
-            return Response(result)
+            params = PageParams(request)
+            filters = {key: request.query_params[key] for key in IMAGE_FILTERS if request.query_params.get(key)}
+            rows, next_marker = marker_page(
+                list_all_images(token, project_id, marker=params.after, page_size=params.limit, **filters),
+                params.limit,
+            )
+            return params.response(rows, next_marker)
+        except InvalidPageParams as e:
+            return Response({"error": str(e)}, status=400)
         except ValueError as ve:
             return Response({"error": str(ve)}, status=401)
         except Exception as e:
@@ -42,15 +54,22 @@ class SnapshotListAPIView(APIView):
 
         try:
             token = get_valid_token(redis_client, username, project_id)
-            result = list_snapshots(token, project_id)
-            return Response(result)
+            params = PageParams(request)
+            filters = {key: request.query_params[key] for key in IMAGE_FILTERS if request.query_params.get(key)}
+            rows, next_marker = marker_page(
+                list_snapshots(token, project_id, marker=params.after, page_size=params.limit, **filters),
+                params.limit,
+            )
+            return params.response(rows, next_marker)
+        except InvalidPageParams as e:
+            return Response({"error": str(e)}, status=400)
         except ValueError as ve:
             return Response({"error": str(ve)}, status=401)
         except Exception as e:
             return Response({"error": str(e)}, status=500)
 
 
-class CreateImageAsAdminView(APIView):
+class CreateImageAsAdminView(SpooledUploadMixin, APIView):
     permission_classes = [IsAdmin]
     parser_classes = (MultiPartParser, FormParser)
 
@@ -64,10 +83,9 @@ class CreateImageAsAdminView(APIView):
             project_id = request.auth.get('project_id')
 
             token_key = f"keystone_token:{username}:{project_id}"
-            token_bytes = redis_client.get(token_key)
+            admin_token = redis_client.get(token_key)
 
             # Step 2: Get admin token and connection
-            admin_token = token_bytes.decode()
             if not admin_token:
                 return Response({"error": "Failed to get admin token."}, status=500)
 
@@ -90,14 +108,113 @@ class CreateImageAsAdminView(APIView):
                 visibility=visibility
             )
 
-            # Step 5: Upload image content
-            conn.image.upload_image(image, data=image_file)
+            # Step 5: Stream the spooled file to Glance chunk by chunk
+            upload_image_file(conn, image.id, image_file)
 
             return Response({
                 "message": "Image created successfully.",
                 "image_id": image.id,
-                "image_name": image.name
+                "image_name": image.name,
+                "checksums": image_file.checksums,
             }, status=201)
 
+        except ChecksumMismatch as e:
+            return Response({"error": str(e)}, status=502)
         except Exception as e:
-            return Response({"error": str(e)}, status=500)
\ No newline at end of file
+            return Response({"error": str(e)}, status=500)
+
+
+def _job_response(job, status=200):
+    fields = ("id", "status", "name", "disk_format", "visibility", "size", "received", "sent", "image_id", "error")
+    return Response({field: job.get(field) for field in fields}, status=status)
+
+
+class ImageImportView(APIView):
+    """
+    Start a resumable image import. The client then PATCHes chunks to the
+    job and polls it until the image is active.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        username = request.auth.get("username")
+        project_id = request.auth.get("project_id")
+        try:
+            get_valid_token(redis_client, username, project_id)
+        except ValueError as ve:
+            return Response({"error": str(ve)}, status=401)
+
+        name = request.data.get("name")
+        disk_format = request.data.get("disk_format")
+        visibility = request.data.get("visibility", "private")
+        try:
+            size = int(request.data.get("size"))
+        except (TypeError, ValueError):
+            return Response({"error": "size must be an integer number of bytes."}, status=400)
+
+        if not all([name, disk_format]):
+            return Response({"error": "Missing required fields."}, status=400)
+        if not 0 < size <= settings.IMAGE_IMPORT_MAX_SIZE:
+            return Response({"error": f"size must be between 1 and {settings.IMAGE_IMPORT_MAX_SIZE} bytes."}, status=400)
+
+        job = image_import.create_job(username, project_id, name, disk_format, visibility, size)
+        return _job_response(job, status=201)
+
+
+class ImageImportDetailView(APIView):
+    """
+    GET: poll job status and the resume offset (``received``).
+    PATCH: multipart ``chunk`` written at ``offset``; the last chunk queues the import.
+    DELETE: cancel a job that is not being imported.
+    """
+    permission_classes = [IsAuthenticated]
+    parser_classes = (MultiPartParser, FormParser)
+
+    def _get_job(self, request, job_id):
+        job = image_import.get_job(job_id)
+        if (
+            job is None
+            or job["username"] != request.auth.get("username")
+            or job["project_id"] != request.auth.get("project_id")
+        ):
+            return None
+        return job
+
+    def get(self, request, job_id):
+        job = self._get_job(request, job_id)
+        if job is None:
+            return Response({"error": "Import job not found."}, status=404)
+        return _job_response(job)
+
+    def patch(self, request, job_id):
+        job = self._get_job(request, job_id)
+        if job is None:
+            return Response({"error": "Import job not found."}, status=404)
+
+        chunk = request.FILES.get("chunk")
+        try:
+            offset = int(request.data.get("offset"))
+        except (TypeError, ValueError):
+            return Response({"error": "offset must be an integer."}, status=400)
+        if chunk is None:
+            return Response({"error": "Missing chunk."}, status=400)
+
+        try:
+            job = image_import.append_chunk(job, offset, chunk)
+        except image_import.ImportConflict as e:
+            job = image_import.get_job(job_id)
+            return Response({"error": str(e), "received": job["received"]}, status=409)
+
+        if job["status"] == image_import.QUEUED:
+            import_image_job.delay(job_id)
+        return _job_response(job)
+
+    def delete(self, request, job_id):
+        job = self._get_job(request, job_id)
+        if job is None:
+            return Response({"error": "Import job not found."}, status=404)
+        if job["status"] in (image_import.QUEUED, image_import.IMPORTING):
+            return Response({"error": f"Job is {job['status']} and cannot be cancelled."}, status=409)
+
+        image_import.delete_job(job_id)
+        return Response(status=204)
@@ -1,16 +1,20 @@
-import redis
+import asyncio
+
 import requests
+from adrf.views import APIView as AsyncAPIView
 from django.conf import settings
 from openstack.exceptions import ResourceNotFound
 from rest_framework.parsers import JSONParser
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from utils.async_http import aget_token, alist_pages
 from utils.conn import connect_with_token_v5
+from utils.pagination import InvalidPageParams, PageParams, marker_page
+from utils.redis_client import redis_client
 
 from project.models import FloatingIPPool
-
-redis_client = redis.Redis(host='redis', port=6379, db=0)
+from project.service import release_floating_ip
 
 
 class PortListView(APIView):
@@ -27,11 +31,21 @@ class PortListView(APIView):
             return Response({"detail": "Token not found in Redis."}, status=401)
 
         try:
-            token = token_bytes.decode()
+            params = PageParams(request)
+        except InvalidPageParams as e:
+            return Response({"detail": str(e)}, status=400)
+
+        try:
+            token = token_bytes
             conn = connect_with_token_v5(token, project_id)
 
+            page, next_marker = marker_page(
+                conn.network.ports(network_id=network_id, limit=params.limit, marker=params.after),
+                params.limit, key=lambda port: port.id,
+            )
+
             ports = []
-            for port in conn.network.ports(network_id=network_id):
+            for port in page:
                 port_name = port.name or f"Port-{port.id[:8]}"
                 ip_addresses = [ip['ip_address'] for ip in port.fixed_ips]
 
@@ -45,7 +59,7 @@ class PortListView(APIView):
                     "device_id": port.device_id,
                 })
 
-            return Response(ports)
+            return params.response(ports, next_marker)
 
         except Exception as e:
             return Response(
@@ -94,7 +108,7 @@ class AttachFloatingIPView(APIView):
             return Response({"detail": "Token not found in Redis."}, status=401)
 
         try:
-            token = token_bytes.decode()
+            token = token_bytes
             conn = connect_with_token_v5(token, project_id)
 
             server_id = request.data.get("server_id")
@@ -151,12 +165,21 @@ class NetworkListView(APIView):
 
         if not token_bytes:
             return Response({"detail": "Token not found in Redis."}, status=401)
-        token = token_bytes.decode()
+        try:
+            params = PageParams(request)
+        except InvalidPageParams as e:
+            return Response({"detail": str(e)}, status=400)
+
+        token = token_bytes
         conn = connect_with_token_v5(token, project_id)
 
         networks = []
         try:
-            for net in conn.network.networks():
+            page, next_marker = marker_page(
+                conn.network.networks(limit=params.limit, marker=params.after),
+                params.limit, key=lambda net: net.id,
+            )
+            for net in page:
                 count_subnet =len(net.subnet_ids)
                 networks.append({
                     "id": net.id,
@@ -171,7 +194,7 @@ class NetworkListView(APIView):
         except Exception as e:
             return Response({"error": str(e)}, status=500)
 
-        return Response(networks)
+        return params.response(networks, next_marker)
 
 
 class CreateNetworkView(APIView):
@@ -186,7 +209,7 @@ class CreateNetworkView(APIView):
         if not token_bytes:
             return Response({"detail": "Token not found in Redis."}, status=401)
 
-        token = token_bytes.decode()
+        token = token_bytes
         conn = connect_with_token_v5(token, project_id)
 
         # Extract form data
@@ -253,12 +276,21 @@ class SubnetListView(APIView):
         if not token_bytes:
             return Response({"detail": "Token not found in Redis."}, status=401)
 
-        token = token_bytes.decode()
+        try:
+            params = PageParams(request)
+        except InvalidPageParams as e:
+            return Response({"detail": str(e)}, status=400)
+
+        token = token_bytes
         conn = connect_with_token_v5(token, project_id)
 
         subnets = []
         try:
-            for subnet in conn.network.subnets():
+            page, next_marker = marker_page(
+                conn.network.subnets(limit=params.limit, marker=params.after),
+                params.limit, key=lambda subnet: subnet.id,
+            )
+            for subnet in page:
                 subnet_data = subnet.to_dict()
                 subnets.append({
                     "id": subnet.id,
@@ -276,7 +308,7 @@ class SubnetListView(APIView):
         except Exception as e:
             return Response({"error": str(e)}, status=500)
 
-        return Response(subnets)
+        return params.response(subnets, next_marker)
 
 
 class AssignOrReplaceFloatingIPView(APIView):
@@ -298,7 +330,7 @@ class AssignOrReplaceFloatingIPView(APIView):
             return Response({"detail": "Both 'ip_id' and 'vm_id' are required."}, status=400)
 
         try:
-            token = token_bytes.decode()
+            token = token_bytes
             conn = connect_with_token_v5(token, project_id)
 
             # Get the new IP to assign (from DB)
@@ -314,10 +346,7 @@ class AssignOrReplaceFloatingIPView(APIView):
                         address=os_old_fip.floating_ip_address
                     )
 
-                existing_ip.vm_id = None
-                existing_ip.status = "available"
-                existing_ip.project_id = None
-                existing_ip.save()
+                release_floating_ip(existing_ip)
 
             # Ensure new IP exists in OpenStack
             os_new_fip = conn.network.find_ip(new_ip.ip_address)
@@ -394,7 +423,7 @@ class AddingFloatingIPView(APIView):
             return Response({"detail": "Both 'ip_id' and 'vm_id' are required."}, status=400)
 
         try:
-            token = token_bytes.decode()
+            token = token_bytes
             conn = connect_with_token_v5(token, project_id)
 
             # Lấy IP từ DB
@@ -506,7 +535,7 @@ class RemovingFloatingIPView(APIView):
             return Response({"detail": "Both 'ip_id' and 'vm_id' are required."}, status=400)
 
         try:
-            token = token_bytes.decode()
+            token = token_bytes
             conn = connect_with_token_v5(token, project_id)
 
             # Tìm IP trong DB
@@ -595,45 +624,51 @@ class CreateNetworkAPI(APIView):
             return Response({"error": str(e)}, status=500)
 
 
-class ListAllIPView(APIView):
+class ListAllIPView(AsyncAPIView):
     permission_classes = [IsAuthenticated]
 
-    def get(self, request):
-        username = request.user.username
+    async def get(self, request):
+        username = request.auth.get("username")
         project_id = request.auth.get("project_id")
-        token_key = f"keystone_token:{username}:{project_id}"
-        token_bytes = redis_client.get(token_key)
+        token = await aget_token(username, project_id)
 
-        if not token_bytes:
+        if not token:
             return Response({"detail": "Token not found in Redis."}, status=401)
 
+        network_url = f"{settings.OPENSTACK_NETWORK_URL}/v2.0"
         try:
-            token = token_bytes.decode()
-            conn = connect_with_token_v5(token, project_id)
+            # Floating IPs and compute ports are independent; fetch both at once
+            fips, ports = await asyncio.gather(
+                alist_pages(f"{network_url}/floatingips", token, "floatingips", {"project_id": project_id}),
+                alist_pages(
+                    f"{network_url}/ports", token, "ports",
+                    {"device_owner": "compute:nova", "project_id": project_id},
+                ),
+            )
 
-            # 1. Get all floating IPs
+            # 1. Floating IPs
             floating_ips = []
-            for fip in conn.network.ips(project_id=project_id):
-                if fip.floating_ip_address:
+            for fip in fips:
+                address = fip.get("floating_ip_address")
+                if address:
                     floating_ips.append({
-                        "ip": fip.floating_ip_address,
-                        "fixed_ip": fip.fixed_ip_address,
-                        "port_id": fip.port_id,
-                        "status": fip.status,
+                        "ip": address,
+                        "fixed_ip": fip.get("fixed_ip_address"),
+                        "port_id": fip.get("port_id"),
+                        "status": fip.get("status"),
                         "type": "floating",
-                        "version": "IPv6" if ":" in fip.floating_ip_address else "IPv4"
+                        "version": "IPv6" if ":" in address else "IPv4"
                     })
 
-            # 2. Get all fixed IPs from ports
+            # 2. Fixed IPs from ports
             fixed_ips = []
-            ports = conn.network.ports(device_owner="compute:nova", project_id=project_id)
             for port in ports:
-                for fixed in port.fixed_ips:
+                for fixed in port.get("fixed_ips", []):
                     ip = fixed.get("ip_address")
                     fixed_ips.append({
                         "ip": ip,
-                        "port_id": port.id,
-                        "device_id": port.device_id,
+                        "port_id": port["id"],
+                        "device_id": port.get("device_id"),
                         "type": "fixed",
                         "version": "IPv6" if ":" in ip else "IPv4"
                     })
@@ -660,7 +695,7 @@ class GetVMIPsView(APIView):
             return Response({"detail": "Token not found in Redis."}, status=401)
 
         try:
-            token = token_bytes.decode()
+            token = token_bytes
             conn = connect_with_token_v5(token, project_id)
 
             server = conn.compute.get_server(vm_id)
@@ -718,7 +753,7 @@ class ChangePasswordVMView(APIView):
             return Response({"detail": "Missing 'new_password' in request body."}, status=400)
 
         try:
-            token = token_bytes.decode()
+            token = token_bytes
             conn = connect_with_token_v5(token, project_id)
 
             # Kiểm tra VM tồn tại
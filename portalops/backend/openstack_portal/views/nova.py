@@ -1,23 +1,29 @@
-import json
-
-import redis
+import httpx
 import requests
+from adrf.views import APIView as AsyncAPIView
 from django.shortcuts import render
 from rest_framework import serializers, permissions, status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-import time
+from openstack.exceptions import ResourceNotFound
+from ..services.catalog import (
+    PUBLIC_CATALOG_KEY, combined_etag, merge_catalogs, needs_revalidation, project_catalog_key,
+)
+from ..services.glance import checksum_mismatch
+from ..services.nova import InstanceNotFound, aget_vps_detail, invalidate_vps_detail
 from ..tasks import fetch_and_cache_instance_options
-from project.models import ProjectType
+from project.models import ProjectType, ProjectUserMapping
 
 from userauth.permissions import IsAdmin
 
-from overview.tasks import cache_user_instances
-
-from utils.conn import get_admin_connection
+from overview.events import publish_instance_event, publish_project_instance_event
 
-redis_client = redis.Redis(host='redis', port=6379, db=0)
+from utils.async_http import aget_token
+from utils.conn import get_admin_connection, get_cached_connection
+from utils.pagination import InvalidPageParams, PageParams
+from utils.redis_client import redis_client, cache_get, cache_set
+from utils.uploads import SpooledUploadMixin, iter_chunks
 
 class InstanceOptionsView(APIView):
     permission_classes = [IsAuthenticated]
@@ -29,26 +35,27 @@ class InstanceOptionsView(APIView):
         if not project_id:
             return Response({"error": "Missing project_id in token"}, status=400)
 
-        # Redis key để cache options theo user + project
-        redis_key = f"instance_options:{username}:{project_id}"
-        cached_data = redis_client.get(redis_key)
-
-        if cached_data:
-            try:
-                data = json.loads(cached_data)
-                return Response(data)
-            except json.JSONDecodeError:
-                pass  # Nếu lỗi parse, fallback để fetch mới
+        # Public catalog is shared by all users, the overlay is per project;
+        # both tiers are merged here at read time.
+        public = cache_get(PUBLIC_CATALOG_KEY)
+        project = cache_get(project_catalog_key(project_id))
 
         # Lấy Keystone token từ Redis
         token_key = f"keystone_token:{username}:{project_id}"
         token = redis_client.get(token_key)
+
+        if public is not None and project is not None:
+            if token and needs_revalidation(public):
+                fetch_and_cache_instance_options.delay(username, token, project_id)
+
+            etag = f'"{combined_etag(public, project)}"'
+            if request.headers.get("If-None-Match") == etag:
+                return Response(status=304, headers={"ETag": etag})
+            return Response(merge_catalogs(public, project, project_id), headers={"ETag": etag})
+
         if not token:
             return Response({"error": "Token expired or missing"}, status=401)
 
-        if isinstance(token, bytes):
-            token = token.decode()
-
         try:
             data = fetch_and_cache_instance_options(username, token, project_id)
             return Response(data)
@@ -61,19 +68,21 @@ class InstanceOptionsView(APIView):
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-import json
 
 def vl_connect_with_token(token, project_id):
-    auth = v3.Token(
-        auth_url=settings.OPENSTACK_AUTH["auth_url"],
-        token=token,
-        project_id=project_id
-    )
-    sess = session.Session(auth=auth)
-    return connection.Connection(
-        session=sess,
-        block_storage_api_version='3',  # Force Cinder v3
-    )
+    def build():
+        auth = v3.Token(
+            auth_url=settings.OPENSTACK_AUTH["auth_url"],
+            token=token,
+            project_id=project_id
+        )
+        sess = session.Session(auth=auth)
+        return connection.Connection(
+            session=sess,
+            block_storage_api_version='3',  # Force Cinder v3
+        )
+
+    return get_cached_connection("nova_block_storage", token, project_id, build)
 
 def fetch_volume_types(conn):
     try:
@@ -95,13 +104,10 @@ class VolumeOptionsView(APIView):
             return Response({"error": "Missing project_id in token"}, status=400)
 
         redis_key = f"volume_options:{username}:{project_id}"
-        cached_data = redis_client.get(redis_key)
+        cached_data = cache_get(redis_key)
 
-        if cached_data:
-            try:
-                return Response(json.loads(cached_data))
-            except json.JSONDecodeError:
-                pass
+        if cached_data is not None:
+            return Response(cached_data)
 
         token_key = f"keystone_token:{username}:{project_id}"
         token = redis_client.get(token_key)
@@ -152,7 +158,7 @@ class VolumeOptionsView(APIView):
                 "snapshots": snapshots,
             }
 
-            redis_client.set(redis_key, json.dumps(data), ex=300)
+            cache_set(redis_key, data, ex=300)
             return Response(data)
 
         except Exception as e:
@@ -160,9 +166,6 @@ class VolumeOptionsView(APIView):
 
 
 
-from utils.redis_client import redis_client
-
-
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 from django.conf import settings
@@ -208,8 +211,10 @@ class CreateInstanceAPI(APIView):
                 networks=[{"uuid": network_id}],
                 availability_zone="nova"
             )
-            time.sleep(12)
-            cache_user_instances(username, token, project_id)
+            publish_instance_event(
+                username, token, project_id, server.id, "create",
+                name=name, flavor_id=flavor_id, region="nova",
+            )
             return Response({"instance": server.to_dict()}, status=201)
 
         except Exception as e:
@@ -245,12 +250,32 @@ class CreateInstanceAsAdminAPI(APIView):
                 networks=[{"uuid": network_id}],
                 availability_zone="nova"
             )
-
+            publish_project_instance_event(
+                self._member_tokens(target_project_id), target_project_id, server.id, "create",
+                name=name, flavor_id=flavor_id, region="nova",
+            )
             return Response({"instance": server.to_dict()}, status=201)
 
         except Exception as e:
             return Response({"error": f"Failed to create instance: {str(e)}"}, status=500)
 
+    @staticmethod
+    def _member_tokens(project_id):
+        """
+        (username, token) of the project's active members that are logged in,
+        i.e. whose cached instance list should show the new server.
+        """
+        usernames = ProjectUserMapping.objects.filter(
+            project__openstack_id=project_id, is_active=True
+        ).values_list("user__username", flat=True)
+
+        users = []
+        for username in usernames:
+            token = redis_client.get(f"keystone_token:{username}:{project_id}")
+            if token:
+                users.append((username, token.decode() if isinstance(token, bytes) else token))
+        return users
+
 
 
 
@@ -258,21 +283,14 @@ class CreateInstanceAsAdminAPI(APIView):
 from keystoneauth1 import session
 from keystoneauth1.identity import v3
 
-def connect_with_token(token, project_id):
-    auth = v3.Token(
-        auth_url=settings.OPENSTACK_AUTH["auth_url"],
-        token=token,
-        project_id=project_id
-    )
-    sess = session.Session(auth=auth)
-    return connection.Connection(session=sess)
+from utils.conn import connect_with_token
 
 
 
 from rest_framework.parsers import MultiPartParser, FormParser
 
 
-class CreateImageAPI(APIView):
+class CreateImageAPI(SpooledUploadMixin, APIView):
     permission_classes = [IsAuthenticated]
     parser_classes = (MultiPartParser, FormParser)
 
@@ -327,11 +345,20 @@ class CreateImageAPI(APIView):
                 "X-Auth-Token": token,
                 "Content-Type": "application/octet-stream"
             }
-            upload_resp = requests.put(upload_url, data=image_file.read(), headers=upload_headers)
+            # Stream the spooled file in chunks instead of reading it into memory
+            upload_resp = requests.put(upload_url, data=iter_chunks(image_file), headers=upload_headers)
             if upload_resp.status_code not in [200, 201, 204]:
                 return Response(upload_resp.json(), status=upload_resp.status_code)
 
-            return Response(image, status=201)
+            stored = requests.get(f"{glance_url}/{image_id}", headers=headers)
+            if stored.ok:
+                error = checksum_mismatch(stored.json(), image_file.checksums)
+                if error:
+                    # Do not leave a corrupt image registered and bootable
+                    requests.delete(f"{glance_url}/{image_id}", headers=headers)
+                    return Response({"error": error}, status=502)
+
+            return Response({**image, "checksums": image_file.checksums}, status=201)
 
         except Exception as e:
             return Response({"error": str(e)}, status=500)
@@ -364,29 +391,29 @@ class InstanceActionAPI(APIView):
         try:
             conn = connect_with_token(token, project_id)
 
-            server = conn.compute.get_server(id)
-            if not server:
-                return Response({"error": "Instance not found"}, status=404)
-
+            # The server id is passed straight to the action call, so an
+            # action costs one Nova request.
             if action == "start":
-                conn.compute.start_server(server)
+                conn.compute.start_server(id)
             elif action == "stop":
-                conn.compute.stop_server(server)
+                conn.compute.stop_server(id)
             elif action == "reboot":
-                conn.compute.reboot_server(server, reboot_type="SOFT")
+                conn.compute.reboot_server(id, reboot_type="SOFT")
             elif action == "resize":
                 new_flavor_id = request.data.get("flavor_id")
                 if not new_flavor_id:
                     return Response({"error": "Missing flavor_id for resize"}, status=400)
-                conn.compute.resize_server(server, flavor=new_flavor_id)
+                conn.compute.resize_server(id, flavor=new_flavor_id)
             elif action == "delete":
-                conn.compute.delete_server(server, ignore_missing=True)
+                conn.compute.delete_server(id, ignore_missing=True)
             else:
                 return Response({"error": f"Unsupported action: {action}"}, status=400)
-            time.sleep(7)
-            cache_user_instances(username, token, project_id)
+
+            publish_instance_event(username, token, project_id, id, action)
             return Response({"message": f"Action '{action}' executed successfully on instance {id}"})
 
+        except ResourceNotFound:
+            return Response({"error": "Instance not found"}, status=404)
         except Exception as e:
             return Response({"error": str(e)}, status=500)
 
@@ -406,12 +433,23 @@ class KeypairView(APIView):
         if not token:
             return Response({"error": "Token expired or missing"}, status=401)
 
+        try:
+            params = PageParams(request)
+        except InvalidPageParams as e:
+            return Response({"error": str(e)}, status=400)
+
         try:
             conn = connect_with_token(token, project_id)
-            keypairs = conn.compute.keypairs()
+
+            # Keypairs are per user and few; page by name in memory
+            keypairs = sorted(conn.compute.keypairs(), key=lambda keypair: keypair.name)
+            if params.after is not None:
+                keypairs = [keypair for keypair in keypairs if keypair.name > params.after]
+            page = keypairs[:params.limit]
+            next_after = page[-1].name if params.limit and len(keypairs) > params.limit else None
 
             result = []
-            for keypair in keypairs:
+            for keypair in page:
                 result.append({
                     "name": keypair.name,
                     "fingerprint": keypair.fingerprint,
@@ -419,7 +457,7 @@ class KeypairView(APIView):
                     "public_key": keypair.public_key,
                 })
 
-            return Response(result)
+            return params.response(result, next_after)
 
         except Exception as e:
             return Response({"error": str(e)}, status=500)
@@ -459,111 +497,30 @@ class KeypairView(APIView):
             return Response({"error": str(e)}, status=500)
 
 
-
-
-
-from datetime import datetime
-
-
-
-class VPSDetailView(APIView):
+class VPSDetailView(AsyncAPIView):
     permission_classes = [IsAuthenticated]
 
-    def get(self, request, instance_id):
+    async def get(self, request, instance_id):
         username = request.auth.get("username")
         project_id = request.auth.get("project_id")
         if not project_id:
             return Response({"error": "Missing project_id in token"}, status=400)
 
-        token_key = f"keystone_token:{username}:{project_id}"
-        token = redis_client.get(token_key)
+        token = await aget_token(username, project_id)
         if not token:
             return Response({"error": "Token expired or missing"}, status=401)
-        if isinstance(token, bytes):
-            token = token.decode()
 
         try:
-            conn = vl_connect_with_token(token, project_id)
-
-            # Get instance info
-            instance = conn.compute.get_server(instance_id)
-            flavor_id_or_name = instance.flavor.get("id")
-            flavor = conn.compute.find_flavor(flavor_id_or_name)
-
-            if not flavor:
-                return Response({"error": f"Flavor '{flavor_id_or_name}' not found"}, status=404)
-
-            image = conn.compute.get_image(instance.image["id"]) if instance.image else None
-            addresses = instance.addresses or {}
-
-            # Network info
-            private_ip, floating_ip, mac_address, subnet = "", "", "", ""
-            for net in addresses.values():
-                for addr in net:
-                    if addr.get("OS-EXT-IPS:type") == "floating":
-                        floating_ip = addr["addr"]
-                    elif addr.get("OS-EXT-IPS:type") == "fixed":
-                        private_ip = addr["addr"]
-                        mac_address = addr.get("OS-EXT-IPS-MAC:mac_addr", "")
-                        subnet = addr.get("subnet", "")
-
-            # Attached volumes
-            volumes = []
-            for attachment in instance.attached_volumes:
-                vol = conn.block_storage.get_volume(attachment["id"])
-                volumes.append({
-                    "id": vol.id,
-                    "name": vol.name,
-                    "size": f"{vol.size} GB",
-                    "status": vol.status
-                })
-
-            glance_snapshots = [
-                {
-                    "id": img.id,
-                    "name": img.name or img.id,
-                    "size": f"{img.size / (1024 ** 3):.2f} GB",
-                    "created_at": img.created_at
-                }
-                for img in conn.image.images()
-                if img.visibility == "private"
-                   and img.get("image_type") == "snapshot"
-            ]
-
-            if isinstance(instance.created_at, datetime):
-                created_at = instance.created_at.isoformat()
-            else:
-                created_at = instance.created_at  # giữ nguyên nếu đã là string
-            data = {
-                "id": instance.id,
-                "name": instance.name,
-                "status": instance.status,
-                "ip": floating_ip or private_ip,
-                "cpu": f"{flavor.vcpus} vCPU",
-                "ram": f"{flavor.ram / 1024:.1f} GB",
-                "disk": f"{flavor.disk} GB",
-                "os": image.name if image else "Custom Image",
-                "datacenter": instance.availability_zone,
-                "created_at": created_at,
-
-                "monitoring": {
-                    "cpu_usage": 55,  # Placeholder
-                    "ram_usage": 72,
-                    "disk_usage": 40
-                },
-
-                "snapshots": glance_snapshots,
-                "volumes": volumes,
-                "network": {
-                    "floating_ip": floating_ip,
-                    "private_ip": private_ip,
-                    "mac_address": mac_address,
-                    "subnet": subnet or "192.168.1.0/24"  # fallback
-                }
-            }
+            data = await aget_vps_detail(token, project_id, instance_id)
+            if data is None:
+                return Response({"error": "Flavor of instance not found"}, status=404)
 
             return Response(data)
 
+        except InstanceNotFound:
+            return Response({"error": "Instance not found"}, status=404)
+        except httpx.HTTPStatusError as e:
+            return Response({"error": str(e)}, status=502)
         except Exception as e:
             return Response({"error": str(e)}, status=500)
 
@@ -597,6 +554,7 @@ class InstanceSnapshotView(APIView):
             conn = vl_connect_with_token(token, project_id)
 
             image = conn.compute.create_server_image(instance_id, snapshot_name)
+            invalidate_vps_detail(project_id, instance_id)
             return Response(
                 {"message": f"Snapshot '{snapshot_name}' created successfully", "image_id": image.id},
                 status=status.HTTP_201_CREATED,
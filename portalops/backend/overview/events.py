@@ -0,0 +1,145 @@
+"""
+Instance mutation events.
+
+Action endpoints publish a small delta (server id, action, expected status)
+instead of re-crawling the project. The cached instance list is patched in
+place right away, and a delayed cache_user_instances run reconciles it with
+what Nova actually reports.
+"""
+import json
+import logging
+import time
+
+import redis
+from django.conf import settings
+
+from utils.cache_codec import CacheDecodeError, decode, encode
+from utils.redis_client import redis_client, redis_raw_client, cache_get
+from openstack_portal.services.nova import vps_detail_cache_key
+from .limits import invalidate_limits
+from .summary import adjust_system_summary
+from .tasks import cache_user_instances, instances_cache_key, format_plan
+
+logger = logging.getLogger(__name__)
+
+INSTANCE_EVENTS_CHANNEL = "instance_events"
+
+# Status shown in the cached list right after an action was accepted by Nova
+EXPECTED_STATUS = {
+    "create": "Offline",
+    "start": "Online",
+    "reboot": "Online",
+    "stop": "Offline",
+}
+
+
+def _patch_instances(instances, event, project_id):
+    server_id = event["server_id"]
+    action = event["action"]
+
+    if action == "delete":
+        return [vm for vm in instances if vm.get("id") != server_id]
+
+    if action == "create":
+        if any(vm.get("id") == server_id for vm in instances):
+            return instances
+        flavor_map = cache_get(f"flavors_cache:{project_id}") or {}
+        flavor = flavor_map.get(event.get("flavor_id"))
+        return instances + [{
+            "id": server_id,
+            "name": event.get("name"),
+            "status": event["status"],
+            "fixed_ips": [],
+            "floating_ips": [],
+            "plan": format_plan(flavor) if flavor else "Unknown",
+            "region": event.get("region", ""),
+            "created": time.strftime("%Y-%m-%d", time.gmtime(event["at"])),
+        }]
+
+    for vm in instances:
+        if vm.get("id") == server_id and event.get("status"):
+            vm["status"] = event["status"]
+    return instances
+
+
+def _adjust_summary(project_id, event):
+    if event["action"] == "create":
+        flavor = (cache_get(f"flavors_cache:{project_id}") or {}).get(event.get("flavor_id")) or {}
+        adjust_system_summary(project_id, instances=1, vcpus=flavor.get("vcpus") or 0)
+    elif event["action"] == "delete":
+        # vCPUs of the deleted server are reconciled by the next refresh
+        adjust_system_summary(project_id, instances=-1)
+
+
+def apply_instance_event(username, project_id, event, retries=3):
+    """
+    Patch the cached instance list of username/project with ``event``.
+    Uses WATCH/MULTI so a concurrent refresh is never overwritten by a stale patch.
+    """
+    key = instances_cache_key(username, project_id)
+
+    for _ in range(retries):
+        with redis_raw_client.pipeline() as pipe:
+            try:
+                pipe.watch(key)
+                payload = pipe.get(key)
+                if payload is None:
+                    return False
+                try:
+                    envelope = decode(payload)
+                except CacheDecodeError:
+                    return False
+
+                envelope["instances"] = _patch_instances(envelope.get("instances", []), event, project_id)
+
+                pipe.multi()
+                pipe.set(key, encode(envelope), keepttl=True)
+                pipe.execute()
+                return True
+            except redis.WatchError:
+                continue
+
+    logger.warning(f"[{username}] Could not patch {key} after {retries} attempts")
+    return False
+
+
+def publish_instance_event(username, token, project_id, server_id, action, **extra):
+    """
+    Record that ``action`` was accepted for ``server_id``: patch the cache,
+    broadcast the delta on INSTANCE_EVENTS_CHANNEL and schedule a reconcile.
+    """
+    return publish_project_instance_event([(username, token)], project_id, server_id, action, **extra)
+
+
+def publish_project_instance_event(users, project_id, server_id, action, **extra):
+    """
+    Same as publish_instance_event, but patches and reconciles the cached
+    instance list of every (username, token) in ``users``. Project-wide
+    effects (summary, limits, broadcast) are applied once.
+    """
+    event = {
+        "server_id": server_id,
+        "action": action,
+        "status": EXPECTED_STATUS.get(action),
+        "project_id": project_id,
+        "at": time.time(),
+        **extra,
+    }
+
+    try:
+        for username, _ in users:
+            apply_instance_event(username, project_id, event)
+        redis_client.delete(vps_detail_cache_key(project_id, server_id))
+        invalidate_limits(project_id)
+        _adjust_summary(project_id, event)
+        redis_client.publish(INSTANCE_EVENTS_CHANNEL, json.dumps(event))
+    except Exception as e:
+        logger.warning(f"Failed to apply instance event {event} for project {project_id}: {e}")
+
+    for username, token in users:
+        cache_user_instances.apply_async(
+            (username, token, project_id),
+            {"force": True},
+            countdown=getattr(settings, "INSTANCE_RECONCILE_DELAY", 15),
+        )
+    return event
@@ -0,0 +1,89 @@
+"""
+Per-project quota usage shown on the dashboard (LimitSummaryView).
+
+Nova /limits and the Cinder quota set are fetched concurrently, each with its
+own LIMITS_BACKEND_TIMEOUT. The merged summary is cached per project in
+``limits_summary:<project_id>``. It counts as fresh for LIMITS_CACHE_TTL
+seconds and is kept for LIMITS_STALE_TTL seconds as a fallback. When one
+backend fails or is slow, its part is served from that fallback (or null)
+and listed under ``degraded``. Instance and volume mutations drop the entry
+with invalidate_limits.
+"""
+import asyncio
+import logging
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from utils.async_http import aget_json
+from utils.redis_client import redis_client, cache_get, cache_set
+
+logger = logging.getLogger(__name__)
+
+
+def limits_cache_key(project_id):
+    return f"limits_summary:{project_id}"
+
+
+def invalidate_limits(project_id):
+    # Called after a committed mutation; a cache error must not turn it into a 500
+    try:
+        redis_client.delete(limits_cache_key(project_id))
+    except Exception as e:
+        logger.warning(f"Failed to invalidate limits of project {project_id}: {e}")
+
+
+async def _compute_limits(token):
+    body = await aget_json(
+        f"{settings.OPENSTACK_COMPUTE_URL}/limits", token, timeout=settings.LIMITS_BACKEND_TIMEOUT
+    )
+    absolute = body.get("limits", {}).get("absolute", {})
+    return {
+        "cpu": {"used": absolute.get("totalCoresUsed", 0), "limit": absolute.get("maxTotalCores", 0)},
+        "ram": {"used": absolute.get("totalRAMUsed", 0), "limit": absolute.get("maxTotalRAMSize", 0)},
+    }
+
+
+async def _storage_limits(token, project_id):
+    body = await aget_json(
+        f"{settings.OPENSTACK_BLOCK_STORAGE_URL}/{project_id}/os-quota-sets/{project_id}",
+        token,
+        params={"usage": "True"},
+        timeout=settings.LIMITS_BACKEND_TIMEOUT,
+    )
+    gigabytes = body.get("quota_set", {}).get("gigabytes", {})
+    return {"storage": {"used": gigabytes.get("in_use", 0), "limit": gigabytes.get("limit", 0)}}
+
+
+async def aget_limit_summary(token, project_id):
+    """
+    ``{"cpu", "ram", "storage", "degraded", "fetched_at"}``. Raises the
+    compute error only if both backends fail and nothing is cached.
+    """
+    cache_key = limits_cache_key(project_id)
+    cached = await sync_to_async(cache_get, thread_sensitive=False)(cache_key)
+    if cached and time.time() - cached["fetched_at"] < settings.LIMITS_CACHE_TTL:
+        return cached
+
+    compute, storage = await asyncio.gather(
+        _compute_limits(token), _storage_limits(token, project_id), return_exceptions=True
+    )
+
+    summary = {"cpu": None, "ram": None, "storage": None, "degraded": [], "fetched_at": time.time()}
+    for part, keys, fields in (("compute", ("cpu", "ram"), compute), ("storage", ("storage",), storage)):
+        if isinstance(fields, Exception):
+            # Last known values of the failed backend, if any
+            summary["degraded"].append(part)
+            fields = {key: (cached or {}).get(key) for key in keys}
+        summary.update(fields)
+
+    if len(summary["degraded"]) == 2 and not cached:
+        raise compute
+
+    # A degraded summary is kept only until the next request retries the backends
+    if not summary["degraded"]:
+        await sync_to_async(cache_set, thread_sensitive=False)(
+            cache_key, summary, ex=settings.LIMITS_STALE_TTL
+        )
+    return summary
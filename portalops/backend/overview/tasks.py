@@ -1,33 +1,145 @@
 from celery import shared_task
+import time
 import requests
-import redis
-import os
 
 from django.conf import settings
 
-# Redis connection setup
-REDIS_HOST = os.getenv("REDIS_HOST", "redis")
-REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
-redis_client = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=0, decode_responses=True)
+from utils.conn import get_admin_connection
+from utils.redis_client import redis_client, cache_get, cache_set
+from utils.singleflight import single_flight
+from .summary import compute_system_summary, store_system_summary
+
+# Single-flight lock TTL of one user's instance list refresh
+INSTANCES_REFRESH_LOCK_TTL = 120
+
+
+def instances_cache_key(username, project_id):
+    return f"instances_cache:{username}:{project_id}"
+
+
+def schedule_instances_refresh(username, token, project_id):
+    """
+    Enqueue cache_user_instances unless a refresh for the same
+    username/project is already running. Returns True if queued; duplicates
+    that slip through are suppressed by the task's single-flight guard, or
+    return early once an earlier one has refreshed the cache.
+    """
+    if redis_client.exists(cache_user_instances.run.flight_key(username, token, project_id)):
+        return False
+    cache_user_instances.delay(username, token, project_id)
+    return True
+
+
+def format_plan(flavor):
+    vcpus = flavor.get("vcpus")
+    ram = flavor.get("ram")
+    disk = flavor.get("disk")
+    name = flavor.get("name") or flavor.get("original_name") or "Unnamed Plan"
+    return f"{name} ({vcpus} vCPU / {ram}MB / {disk}GB)"
+
+
+def _fetch_flavor_map(session, compute_url):
+    """
+    One /flavors/detail call for every flavor visible to the project.
+    """
+    response = session.get(f"{compute_url}/flavors/detail", params={"is_public": "None"})
+    response.raise_for_status()
+    return {
+        flavor["id"]: {
+            "name": flavor.get("name"),
+            "vcpus": flavor.get("vcpus"),
+            "ram": flavor.get("ram"),
+            "disk": flavor.get("disk"),
+        }
+        for flavor in response.json().get("flavors", [])
+    }
+
+
+def get_flavor_map(session, compute_url, project_id, refresh=False):
+    """
+    Flavor id -> {name, vcpus, ram, disk}, shared through Redis so every
+    cache refresh of the project reuses it until FLAVOR_CACHE_TTL expires.
+    """
+    redis_key = f"flavors_cache:{project_id}"
+
+    if not refresh:
+        cached = cache_get(redis_key)
+        if cached is not None:
+            return cached
+
+    flavor_map = _fetch_flavor_map(session, compute_url)
+    cache_set(redis_key, flavor_map, ex=getattr(settings, "FLAVOR_CACHE_TTL", 3600))
+    return flavor_map
+
+
+def _list_servers(session, compute_url):
+    """
+    All servers of the project, following Nova pagination links.
+    """
+    servers = []
+    url = f"{compute_url}/servers/detail"
+    while url:
+        response = session.get(url)
+        response.raise_for_status()
+        body = response.json()
+        servers.extend(body.get("servers", []))
+        url = next(
+            (link["href"] for link in body.get("servers_links", []) if link.get("rel") == "next"),
+            None
+        )
+    return servers
+
 
 @shared_task
-def cache_user_instances(username, token, project_id):
+@single_flight(key_args=("username", "project_id"), ttl=INSTANCES_REFRESH_LOCK_TTL)
+def cache_user_instances(username, token, project_id, force=False):
     """
     Fetches and caches the list of OpenStack instances for a specific user/project.
-    Separates floating and fixed IPs. Stores data in Redis for 5 minutes.
+    Separates floating and fixed IPs. The list is stored with its fetch time and
+    kept for INSTANCES_CACHE_HARD_TTL; readers treat it as stale after
+    INSTANCES_CACHE_SOFT_TTL and schedule a new refresh while still serving it.
+
+    Flavors are resolved from one shared flavor map instead of one request per
+    server, so a refresh costs a constant number of Nova calls.
+
+    A queued run finding the list younger than INSTANCES_CACHE_SOFT_TTL does
+    nothing; ``force`` (the reconcile after an instance event) skips that check.
     """
-    redis_key = f"instances_cache:{username}:{project_id}"
-    headers = {"X-Auth-Token": token}
+    if not force:
+        cached = cache_get(instances_cache_key(username, project_id))
+        soft_ttl = getattr(settings, "INSTANCES_CACHE_SOFT_TTL", 300)
+        if isinstance(cached, dict) and time.time() - cached.get("fetched_at", 0) < soft_ttl:
+            return None
+    return _cache_user_instances(username, token, project_id)
+
+
+def _cache_user_instances(username, token, project_id):
+    redis_key = instances_cache_key(username, project_id)
     compute_url = settings.OPENSTACK_COMPUTE_URL
 
+    session = requests.Session()
+    session.headers.update({"X-Auth-Token": token})
+
     try:
-        servers_url = f"{compute_url}/servers/detail"
-        response = requests.get(servers_url, headers=headers)
-        response.raise_for_status()
-        servers = response.json().get("servers", [])
+        servers = _list_servers(session, compute_url)
     except requests.RequestException:
         return None
 
+    flavor_map = {}
+    try:
+        flavor_map = get_flavor_map(session, compute_url, project_id)
+
+        # A flavor created after the map was cached: refresh it once, not per server
+        missing = any(
+            server.get("flavor", {}).get("id") not in flavor_map
+            for server in servers
+            if server.get("flavor", {}).get("id")
+        )
+        if missing:
+            flavor_map = get_flavor_map(session, compute_url, project_id, refresh=True)
+    except requests.RequestException:
+        pass
+
     result = []
 
     for server in servers:
@@ -44,23 +156,15 @@ def cache_user_instances(username, token, project_id):
                         elif addr.get("OS-EXT-IPS:type") == "fixed":
                             fixed_ips.append(addr.get("addr"))
 
-        # Flavor (plan) info
-        flavor_id = server.get("flavor", {}).get("id")
+        # Flavor (plan) info: embedded in the server on microversion >= 2.47,
+        # otherwise looked up in the flavor map
+        server_flavor = server.get("flavor", {})
         plan = "Unknown"
 
-        if flavor_id:
-            try:
-                flavor_url = f"{compute_url}/flavors/{flavor_id}"
-                flavor_res = requests.get(flavor_url, headers=headers)
-                flavor_res.raise_for_status()
-                flavor = flavor_res.json().get("flavor", {})
-                vcpus = flavor.get("vcpus")
-                ram = flavor.get("ram")
-                disk = flavor.get("disk")
-                name = flavor.get("name", "Unnamed Plan")
-                plan = f"{name} ({vcpus} vCPU / {ram}MB / {disk}GB)"
-            except requests.RequestException:
-                pass
+        if "vcpus" in server_flavor:
+            plan = format_plan(server_flavor)
+        elif server_flavor.get("id") in flavor_map:
+            plan = format_plan(flavor_map[server_flavor["id"]])
 
         instance = {
             "id": server.get("id"),
@@ -75,5 +179,19 @@ def cache_user_instances(username, token, project_id):
 
         result.append(instance)
 
-    redis_client.set(redis_key, str(result), ex=300)
-    return result
\ No newline at end of file
+    cache_set(
+        redis_key,
+        {"fetched_at": time.time(), "instances": result},
+        ex=getattr(settings, "INSTANCES_CACHE_HARD_TTL", 86400),
+    )
+    return result
+
+
+@shared_task
+@single_flight(key_args=(), ttl=600)
+def refresh_system_summary():
+    """
+    Recompute the admin system summary snapshot (see overview.summary).
+    """
+    totals = store_system_summary(compute_system_summary(get_admin_connection()))
+    return f"✔ System summary refreshed ({totals['total_instances']} instances)"
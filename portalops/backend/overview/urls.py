@@ -1,6 +1,6 @@
 from django.urls import path
 
-from .views import MyInstancesView, LimitSummaryView, CreateConsoleAPI, SystemSummaryView
+from .views import MyInstancesView, LimitSummaryView, CreateConsoleAPI, SystemSummaryView, SingleFlightStatsView
 
 # from .views import ResourceOverviewView, MyInstancesView
 
@@ -9,4 +9,5 @@ urlpatterns = [
     path('limits/', LimitSummaryView.as_view(), name='limit-summary'),
     path('console/', CreateConsoleAPI.as_view(), name='create-console'),
     path("admin/summary/", SystemSummaryView.as_view(),name="admin-summary"),
+    path("admin/single-flight-stats/", SingleFlightStatsView.as_view(), name="single-flight-stats"),
 ]
@@ -0,0 +1,83 @@
+from ipaddress import IPv4Address, ip_address
+
+from django.db import migrations, models
+
+
+def compress_available_ips(apps, schema_editor):
+    """
+    Fold unowned available rows into FloatingIPRange runs. Rows with an
+    admin note stay FloatingIPPool rows so the note is kept.
+    """
+    FloatingIPPool = apps.get_model("project", "FloatingIPPool")
+    FloatingIPRange = apps.get_model("project", "FloatingIPRange")
+
+    rows = FloatingIPPool.objects.filter(
+        models.Q(note__isnull=True) | models.Q(note=""),
+        status="available", project_id__isnull=True, vm_id__isnull=True,
+    )
+    addresses = sorted(
+        (int(ip_address(ip)), network_id, subnet_id, pk)
+        for pk, ip, network_id, subnet_id in rows.values_list("id", "ip_address", "network_id", "subnet_id")
+        if isinstance(ip_address(ip), IPv4Address)
+    )
+
+    ranges = []
+    for ip_int, network_id, subnet_id, _ in addresses:
+        last = ranges[-1] if ranges else None
+        if last and last.last == ip_int - 1 and last.subnet_id == subnet_id:
+            last.last = ip_int
+        else:
+            ranges.append(FloatingIPRange(network_id=network_id, subnet_id=subnet_id, first=ip_int, last=ip_int))
+
+    FloatingIPRange.objects.bulk_create(ranges, batch_size=1000)
+
+    pks = [pk for _, _, _, pk in addresses]
+    for start in range(0, len(pks), 1000):
+        FloatingIPPool.objects.filter(id__in=pks[start:start + 1000]).delete()
+
+
+def expand_ranges(apps, schema_editor):
+    FloatingIPPool = apps.get_model("project", "FloatingIPPool")
+    FloatingIPRange = apps.get_model("project", "FloatingIPRange")
+
+    for rng in FloatingIPRange.objects.iterator():
+        FloatingIPPool.objects.bulk_create(
+            [
+                FloatingIPPool(
+                    ip_address=str(IPv4Address(ip_int)),
+                    subnet_id=rng.subnet_id,
+                    network_id=rng.network_id,
+                    status="available",
+                )
+                for ip_int in range(rng.first, rng.last + 1)
+            ],
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project', '0005_floatingippool_vm_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FloatingIPRange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('network_id', models.UUIDField()),
+                ('subnet_id', models.UUIDField()),
+                ('first', models.BigIntegerField(unique=True)),
+                ('last', models.BigIntegerField()),
+            ],
+            options={
+                'db_table': 'floating_ip_range',
+                'indexes': [
+                    models.Index(fields=['network_id'], name='floating_ip_range_net_idx'),
+                    models.Index(fields=['subnet_id', 'last'], name='floating_ip_range_last_idx'),
+                ],
+            },
+        ),
+        migrations.RunPython(compress_available_ips, expand_ranges),
+    ]
@@ -101,4 +101,30 @@ class FloatingIPPool(models.Model):
         ]
 
     def __str__(self):
-        return f"{self.ip_address} [{self.status}]"
\ No newline at end of file
+        return f"{self.ip_address} [{self.status}]"
+
+
+class FloatingIPRange(models.Model):
+    """
+    A run of consecutive available IPv4 addresses, stored as integers.
+    Available space lives here; only reserved/allocated addresses get a
+    FloatingIPPool row.
+    """
+    network_id = models.UUIDField()
+    subnet_id = models.UUIDField()
+    first = models.BigIntegerField(unique=True)
+    last = models.BigIntegerField()
+
+    class Meta:
+        db_table = "floating_ip_range"
+        indexes = [
+            models.Index(fields=["network_id"], name="floating_ip_range_net_idx"),
+            # release_floating_ip looks up the range ending right below an address
+            models.Index(fields=["subnet_id", "last"], name="floating_ip_range_last_idx"),
+        ]
+
+    def __len__(self):
+        return self.last - self.first + 1
+
+    def __str__(self):
+        return f"{self.first}-{self.last} [{self.subnet_id}]"
@@ -1,11 +1,57 @@
-from utils.conn import get_admin_connection
+import bisect
+import heapq
+import time
+import uuid
 from ipaddress import ip_address, IPv4Address
 
-from .models import IPStatus, FloatingIPPool
+from django.conf import settings
+from django.db import transaction
+
+from utils.conn import get_admin_connection
+from utils.redis_client import redis_client
+from utils.pagination import next_marker
+
+from .models import IPStatus, FloatingIPPool, FloatingIPRange
+
+SYNC_FIELDS = ("subnet_id", "network_id", "project_id", "vm_id", "status")
+
+# High-water mark (Neutron updated_at) and last applied revision per floating IP
+SYNC_SINCE_KEY = "floating_ip_sync:since"
+SYNC_REVISIONS_KEY = "floating_ip_sync:revisions"
+
+
+class NotEnoughFloatingIPs(ValueError):
+    def __init__(self, required, available):
+        super().__init__(
+            f"Not enough available floating IPs in pool. Required: {required}, Available: {available}"
+        )
+        self.required = required
+        self.available = available
 
-def sync_floating_ips():
-    conn = get_admin_connection()
 
+def _uuid(value):
+    return uuid.UUID(str(value)) if value else None
+
+
+def _pool_ranges(conn):
+    """
+    (network_id, subnet_id, first, last) integer ranges of every IPv4
+    allocation pool on an external network, sorted by first address.
+    """
+    ranges = []
+    for net in conn.network.networks(is_router_external=True):
+        for subnet in conn.network.subnets(network_id=net.id, ip_version=4):
+            for pool in subnet.allocation_pools:
+                ranges.append((
+                    _uuid(net.id),
+                    _uuid(subnet.id),
+                    int(ip_address(pool['start'])),
+                    int(ip_address(pool['end'])),
+                ))
+    return sorted(ranges, key=lambda r: r[2])
+
+
+def _floating_ips_by_int(conn):
     # Strictly collect only valid IPv4 Floating IPs
     floating_ips = {}
     for fip in conn.network.ips():
@@ -14,48 +60,393 @@ def sync_floating_ips():
         try:
             ip_obj = ip_address(fip.floating_ip_address)
             if isinstance(ip_obj, IPv4Address):
-                floating_ips[str(ip_obj)] = fip
+                floating_ips[int(ip_obj)] = fip
         except ValueError:
             continue  # Skip malformed IPs
+    return floating_ips
 
-    # Get external networks only
-    external_nets = [
-        net for net in conn.network.networks()
-        if getattr(net, "is_router_external", False)
-    ]
 
-    for net in external_nets:
-        subnets = conn.network.subnets(network_id=net.id)
-        for subnet in subnets:
-            if subnet.ip_version != 4:
-                continue  # Ensure only IPv4 subnets are processed
+def _find_pool(ranges, ip_int):
+    index = bisect.bisect_right([r[2] for r in ranges], ip_int) - 1
+    if index >= 0 and ranges[index][3] >= ip_int:
+        return ranges[index]
+    return None
 
-            for pool in subnet.allocation_pools:
-                start_ip = ip_address(pool['start'])
-                end_ip = ip_address(pool['end'])
-
-                current_ip = start_ip
-                while current_ip <= end_ip:
-                    ip_str = str(current_ip)
-                    fip_data = floating_ips.get(ip_str)
-
-                    if fip_data:
-                        status = IPStatus.ALLOCATED if fip_data.port_id else IPStatus.AVAILABLE
-                        project_id = fip_data.project_id
-                        vm_id = fip_data.port_id
-                    else:
-                        status = IPStatus.AVAILABLE
-                        project_id = None
-                        vm_id = None
-
-                    FloatingIPPool.objects.update_or_create(
-                        ip_address=ip_str,
-                        defaults={
-                            "subnet_id": subnet.id,
-                            "network_id": net.id,
-                            "project_id": project_id,
-                            "vm_id": vm_id,
-                            "status": status,
-                        }
-                    )
-                    current_ip += 1
\ No newline at end of file
+
+def _fip_state(pool, fip_data):
+    network_id, subnet_id = pool[0], pool[1]
+    status = IPStatus.ALLOCATED if fip_data.port_id else IPStatus.AVAILABLE
+    return (subnet_id, network_id, _uuid(fip_data.project_id), _uuid(fip_data.port_id), status)
+
+
+def _free_ranges(pools, occupied):
+    """
+    FloatingIPRange runs covering ``pools`` minus the ``occupied`` addresses.
+    """
+    occupied = sorted(occupied)
+    runs = []
+    for network_id, subnet_id, first, last in pools:
+        start = first
+        lo = bisect.bisect_left(occupied, first)
+        hi = bisect.bisect_right(occupied, last)
+        for ip_int in occupied[lo:hi]:
+            if ip_int > start:
+                runs.append(FloatingIPRange(network_id=network_id, subnet_id=subnet_id, first=start, last=ip_int - 1))
+            start = ip_int + 1
+        if start <= last:
+            runs.append(FloatingIPRange(network_id=network_id, subnet_id=subnet_id, first=start, last=last))
+    return runs
+
+
+def sync_floating_ips():
+    """
+    Mirror the external IPv4 allocation pools into FloatingIPPool/FloatingIPRange.
+
+    Addresses known to Neutron get a row; rows reserved locally for a project
+    or carrying an admin note are kept; every other address of the pools is
+    stored as free integer ranges. Rows are diffed against the existing ones
+    and written with chunked bulk upserts, all in a single transaction. The
+    free ranges and pool rows are locked before they are read, so a
+    concurrent allocation can not hand out an address the rebuild frees.
+    Returns {"created": n, "updated": n, "released": n, "unchanged": n}.
+    """
+    conn = get_admin_connection()
+    pools = _pool_ranges(conn)
+    floating_ips = _floating_ips_by_int(conn)
+
+    desired = {}
+    for ip_int, fip_data in floating_ips.items():
+        pool = _find_pool(pools, ip_int)
+        if pool:
+            desired[ip_int] = _fip_state(pool, fip_data)
+
+    network_ids = {pool[0] for pool in pools}
+    batch_size = getattr(settings, "FLOATING_IP_SYNC_BATCH_SIZE", 1000)
+
+    with transaction.atomic():
+        # allocate_floating_ips and claim_floating_ip lock a range before
+        # creating a row, so holding the ranges blocks new reservations
+        list(FloatingIPRange.objects.select_for_update().filter(network_id__in=network_ids).values_list("id"))
+
+        existing = {}
+        for row in (
+            FloatingIPPool.objects.select_for_update()
+            .filter(network_id__in=network_ids)
+            .values_list("id", "ip_address", "note", *SYNC_FIELDS)
+            .iterator(chunk_size=5000)
+        ):
+            ip_obj = ip_address(row[1])
+            if isinstance(ip_obj, IPv4Address):
+                existing[int(ip_obj)] = (row[0], bool(row[2]), row[3:])
+
+        occupied = set(desired)
+        released = []
+        for ip_int, (pk, noted, state) in existing.items():
+            if ip_int in desired or not _find_pool(pools, ip_int):
+                continue
+            if noted or state[-1] == IPStatus.RESERVED:
+                occupied.add(ip_int)
+            else:
+                released.append(pk)
+
+        changed = []
+        created = 0
+        for ip_int, state in desired.items():
+            current = existing.get(ip_int)
+            if current and current[2] == state:
+                continue
+            if current is None:
+                created += 1
+            changed.append(FloatingIPPool(ip_address=str(IPv4Address(ip_int)), **dict(zip(SYNC_FIELDS, state))))
+
+        for start in range(0, len(changed), batch_size):
+            FloatingIPPool.objects.bulk_create(
+                changed[start:start + batch_size],
+                update_conflicts=True,
+                unique_fields=["ip_address"],
+                update_fields=[*SYNC_FIELDS, "updated_at"],
+            )
+        for start in range(0, len(released), batch_size):
+            FloatingIPPool.objects.filter(id__in=released[start:start + batch_size]).delete()
+
+        FloatingIPRange.objects.filter(network_id__in=network_ids).delete()
+        FloatingIPRange.objects.bulk_create(_free_ranges(pools, occupied), batch_size=batch_size)
+
+    _reset_incremental_state(floating_ips.values())
+
+    return {
+        "created": created,
+        "updated": len(changed) - created,
+        "released": len(released),
+        "unchanged": len(desired) - len(changed),
+    }
+
+
+def _reset_incremental_state(floating_ips):
+    revisions = {fip.id: fip.revision_number or 0 for fip in floating_ips}
+    since = max(
+        (fip.updated_at for fip in floating_ips if fip.updated_at),
+        default=time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    )
+
+    with redis_client.pipeline() as pipe:
+        pipe.delete(SYNC_REVISIONS_KEY)
+        if revisions:
+            pipe.hset(SYNC_REVISIONS_KEY, mapping=revisions)
+        pipe.set(SYNC_SINCE_KEY, since)
+        pipe.execute()
+
+
+def _changed_floating_ips(conn, since):
+    """
+    Raw Neutron floating IPs with updated_at >= ``since`` (changed_since
+    filter of the standard-attr-timestamp extension), following pages.
+    """
+    params = {"changed_since": since, "limit": 500}
+    while True:
+        response = conn.network.get("/floatingips", params=params)
+        response.raise_for_status()
+        body = response.json()
+        yield from body.get("floatingips", [])
+
+        marker = next_marker(body.get("floatingips_links"))
+        if not marker:
+            return
+        params = {**params, "marker": marker}
+
+
+@transaction.atomic
+def _apply_floating_ip_change(fip):
+    """
+    Upsert the row of one changed floating IP, taking its address out of the
+    free ranges if needed. Returns False if the address is in no known pool.
+    """
+    ip_obj = ip_address(fip["floating_ip_address"])
+    if not isinstance(ip_obj, IPv4Address):
+        return False
+    ip_str, ip_int = str(ip_obj), int(ip_obj)
+
+    row = FloatingIPPool.objects.select_for_update().filter(ip_address=ip_str).first()
+    if row is None:
+        rng = _range_containing(ip_int)
+        if rng is None:
+            return False
+        _take_from_range(rng, ip_int)
+        row = FloatingIPPool(ip_address=ip_str, subnet_id=rng.subnet_id, network_id=rng.network_id)
+
+    row.project_id = _uuid(fip.get("project_id") or fip.get("tenant_id"))
+    row.vm_id = _uuid(fip.get("port_id"))
+    row.status = IPStatus.ALLOCATED if fip.get("port_id") else IPStatus.AVAILABLE
+    row.save()
+    return True
+
+
+def sync_floating_ips_incremental():
+    """
+    Apply only the floating IPs Neutron changed since the last sync.
+
+    Changes are fetched with ``changed_since=<high-water mark>``; a floating
+    IP whose revision_number was already applied is skipped. Deleted floating
+    IPs are not reported by Neutron, so they are picked up by the periodic
+    full sync_floating_ips, which also runs here when there is no mark yet.
+    """
+    since = redis_client.get(SYNC_SINCE_KEY)
+    if not since:
+        return {"full": True, **sync_floating_ips()}
+
+    conn = get_admin_connection()
+    changes = list(_changed_floating_ips(conn, since))
+    known_revisions = redis_client.hmget(SYNC_REVISIONS_KEY, [fip["id"] for fip in changes]) if changes else []
+
+    applied = skipped = 0
+    high_water = since
+    revisions = {}
+
+    for fip, known in zip(changes, known_revisions):
+        high_water = max(high_water, fip.get("updated_at") or high_water)
+        revision = fip.get("revision_number") or 0
+        if known is not None and int(known) >= revision:
+            skipped += 1
+            continue
+
+        if fip.get("floating_ip_address") and _apply_floating_ip_change(fip):
+            applied += 1
+        revisions[fip["id"]] = revision
+
+    with redis_client.pipeline() as pipe:
+        if revisions:
+            pipe.hset(SYNC_REVISIONS_KEY, mapping=revisions)
+        pipe.set(SYNC_SINCE_KEY, high_water)
+        pipe.execute()
+
+    return {"full": False, "applied": applied, "skipped": skipped}
+
+
+def _range_containing(ip_int):
+    """
+    Indexed lookup of the free range holding ``ip_int`` (locked), or None.
+    """
+    rng = (
+        FloatingIPRange.objects.select_for_update()
+        .filter(first__lte=ip_int)
+        .order_by("-first")
+        .first()
+    )
+    return rng if rng and rng.last >= ip_int else None
+
+
+def _take_from_range(rng, ip_int):
+    if rng.first == rng.last:
+        rng.delete()
+    elif ip_int == rng.first:
+        rng.first += 1
+        rng.save(update_fields=["first"])
+    elif ip_int == rng.last:
+        rng.last -= 1
+        rng.save(update_fields=["last"])
+    else:
+        FloatingIPRange.objects.create(
+            network_id=rng.network_id, subnet_id=rng.subnet_id, first=ip_int + 1, last=rng.last
+        )
+        rng.last = ip_int - 1
+        rng.save(update_fields=["last"])
+
+
+@transaction.atomic
+def allocate_floating_ips(count, project_id):
+    """
+    Reserve ``count`` free addresses for ``project_id``, lowest first.
+    Raises NotEnoughFloatingIPs if the free ranges are too small.
+    """
+    if count <= 0:
+        return []
+
+    taken = []
+    for rng in FloatingIPRange.objects.select_for_update().order_by("first").iterator(chunk_size=100):
+        n = min(len(rng), count - len(taken))
+        taken.extend((ip_int, rng) for ip_int in range(rng.first, rng.first + n))
+        if n == len(rng):
+            rng.delete()
+        else:
+            rng.first += n
+            rng.save(update_fields=["first"])
+        if len(taken) == count:
+            break
+
+    if len(taken) < count:
+        raise NotEnoughFloatingIPs(count, len(taken))
+
+    return FloatingIPPool.objects.bulk_create([
+        FloatingIPPool(
+            ip_address=str(IPv4Address(ip_int)),
+            subnet_id=rng.subnet_id,
+            network_id=rng.network_id,
+            project_id=project_id,
+            status=IPStatus.RESERVED,
+        )
+        for ip_int, rng in taken
+    ])
+
+
+@transaction.atomic
+def claim_floating_ip(ip, project_id):
+    """
+    Reserve one address for ``project_id``. Raises FloatingIPPool.DoesNotExist
+    if the address is in no pool and ValueError if it is already allocated.
+    """
+    ip_obj = FloatingIPPool.objects.select_for_update().filter(ip_address=ip).first()
+    if ip_obj is None:
+        ip_int = int(ip_address(ip))
+        rng = _range_containing(ip_int)
+        if rng is None:
+            raise FloatingIPPool.DoesNotExist(f"IP {ip} is not in any floating IP pool.")
+        _take_from_range(rng, ip_int)
+        ip_obj = FloatingIPPool(ip_address=ip, subnet_id=rng.subnet_id, network_id=rng.network_id)
+    elif ip_obj.status == IPStatus.ALLOCATED:
+        raise ValueError(f"IP {ip} is already allocated to another project.")
+
+    # Assign IP to project only (no VM)
+    ip_obj.project_id = project_id
+    ip_obj.vm_id = None
+    ip_obj.status = IPStatus.RESERVED
+    ip_obj.save()
+    return ip_obj
+
+
+@transaction.atomic
+def release_floating_ip(ip_obj):
+    """
+    Return an address to the free ranges, merging with its neighbours.
+    An address with an admin note keeps its row and just becomes available.
+    """
+    if ip_obj.note:
+        ip_obj.project_id = None
+        ip_obj.vm_id = None
+        ip_obj.status = IPStatus.AVAILABLE
+        ip_obj.save()
+        return
+
+    ip_int = int(ip_address(ip_obj.ip_address))
+    ip_obj.delete()
+
+    before = (
+        FloatingIPRange.objects.select_for_update()
+        .filter(last=ip_int - 1, subnet_id=ip_obj.subnet_id)
+        .first()
+    )
+    after = (
+        FloatingIPRange.objects.select_for_update()
+        .filter(first=ip_int + 1, subnet_id=ip_obj.subnet_id)
+        .first()
+    )
+
+    if before and after:
+        before.last = after.last
+        after.delete()
+        before.save(update_fields=["last"])
+    elif before:
+        before.last = ip_int
+        before.save(update_fields=["last"])
+    elif after:
+        after.first = ip_int
+        after.save(update_fields=["first"])
+    else:
+        FloatingIPRange.objects.create(
+            network_id=ip_obj.network_id, subnet_id=ip_obj.subnet_id, first=ip_int, last=ip_int
+        )
+
+
+def iter_available_ips(after=None):
+    """
+    Available addresses in ascending order, starting after the integer
+    ``after``: free ranges expanded lazily, merged with rows that Neutron
+    reports as available.
+    """
+    start = after + 1 if after is not None else 0
+
+    def from_ranges():
+        ranges = FloatingIPRange.objects.filter(last__gte=start).order_by("first")
+        for rng in ranges.iterator(chunk_size=100):
+            for ip_int in range(max(rng.first, start), rng.last + 1):
+                yield ip_int, {
+                    "ip_address": str(IPv4Address(ip_int)),
+                    "subnet_id": rng.subnet_id,
+                    "network_id": rng.network_id,
+                    "note": None,
+                }
+
+    def from_rows():
+        rows = FloatingIPPool.objects.filter(status=IPStatus.AVAILABLE).order_by("ip_address")
+        if after is not None:
+            rows = rows.filter(ip_address__gt=str(IPv4Address(after)))
+        for ip in rows.iterator(chunk_size=100):
+            ip_obj = ip_address(ip.ip_address)
+            if isinstance(ip_obj, IPv4Address):
+                yield int(ip_obj), {
+                    "ip_address": ip.ip_address,
+                    "subnet_id": ip.subnet_id,
+                    "network_id": ip.network_id,
+                    "note": ip.note,
+                }
+
+    return heapq.merge(from_ranges(), from_rows(), key=lambda item: item[0])
@@ -1,7 +1,24 @@
 from celery import shared_task
-from .service import sync_floating_ips
+from utils.singleflight import single_flight
+from .service import sync_floating_ips, sync_floating_ips_incremental
+
+# The full sync rebuilds FloatingIPRange rows that the incremental sync
+# updates, so both share one lock. The incremental run may escalate to a
+# full sync, hence the same TTL.
+FLOATING_IP_SYNC_GROUP = "project.floating_ip_sync"
+
 
 @shared_task
+@single_flight(key_args=(), ttl=600, group=FLOATING_IP_SYNC_GROUP)
 def sync_floating_ips_task():
-    sync_floating_ips()
-    return "✔ Floating IP sync completed"
\ No newline at end of file
+    result = sync_floating_ips()
+    return f"✔ Floating IP sync completed ({result['created']} created, {result['updated']} updated)"
+
+
+@shared_task
+@single_flight(key_args=(), ttl=600, group=FLOATING_IP_SYNC_GROUP)
+def sync_floating_ips_incremental_task():
+    result = sync_floating_ips_incremental()
+    if result["full"]:
+        return f"✔ Floating IP sync completed ({result['created']} created, {result['updated']} updated)"
+    return f"✔ Floating IP incremental sync completed ({result['applied']} applied)"
@@ -1,9 +1,15 @@
+import asyncio
+import logging
 from concurrent.futures import ThreadPoolExecutor
 
+import httpx
 import requests
+from adrf.views import APIView as AsyncAPIView
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.contrib.auth.models import User
-from django.shortcuts import render, get_object_or_404
+from django.db.models import OuterRef, Subquery
+from django.shortcuts import render, aget_object_or_404, get_object_or_404
 from openstack.exceptions import SDKException, ResourceNotFound
 from rest_framework import serializers, status
 from rest_framework.permissions import IsAuthenticated
@@ -11,15 +17,24 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from userauth.permissions import IsAdmin
+from openstack_portal.services.nova import aget_flavor_map, get_flavor_map
+from overview.limits import invalidate_limits
 
-from overview.tasks import redis_client
-from .models import ProjectType, ProjectUserMapping, Project, FloatingIPPool, IPStatus
+from utils.redis_client import redis_client, cache_get, cache_set
+from .models import ProjectType, ProjectUserMapping, Project, FloatingIPPool
 from utils.conn import vl_connect_with_token
 
 from utils.conn import connect_with_token_v5
+from utils.async_http import aget_json, aget_token, alist_pages
+from utils.pagination import InvalidPageParams, PageParams, iter_pages, keyset_page, marker_page
+from .service import NotEnoughFloatingIPs, allocate_floating_ips, claim_floating_ip, iter_available_ips
 
 from .serializers import AssignUserToProjectSerializer, ProjectSerializer, ReplaceProjectOwnerSerializer
-from utils.token import get_admin_token
+from utils.token import get_admin_token, invalidate_admin_token
+
+logger = logging.getLogger(__name__)
+
+KEYSTONE_PROJECT_STATUS_KEY = "keystone_project_status"
 
 
 class CreateProjectTypeView(APIView):
@@ -138,29 +153,32 @@ class AllProjectsOverview(APIView):
         if not token_bytes:
             return Response({"error": "Token not found in Redis."}, status=401)
 
+        try:
+            params = PageParams(request)
+        except InvalidPageParams as e:
+            return Response({"error": str(e)}, status=400)
+
         token = token_bytes
         conn = connect_with_token_v5(token, project_id)
 
-        projects = Project.objects.select_related("type").all()
+        # Owner = user of the earliest mapping, resolved in the same query
+        first_mapping = ProjectUserMapping.objects.filter(project=OuterRef("pk")).order_by("joined_at")
+        queryset = Project.objects.select_related("type").annotate(
+            owner_id=Subquery(first_mapping.values("user_id")[:1]),
+            owner_username=Subquery(first_mapping.values("user__username")[:1]),
+        )
+        projects, next_after = keyset_page(queryset, params)
 
-        user_map = {}
-        for mapping in ProjectUserMapping.objects.select_related("user").order_by("joined_at"):
-            if mapping.project_id not in user_map:
-                user_map[mapping.project_id] = mapping.user.id
+        try:
+            keystone_status = self._keystone_status(conn)
+            missing_status = "❌ error: project not found in Keystone"
+        except Exception as e:
+            keystone_status = {}
+            missing_status = f"❌ error: {str(e)}"
 
         result = []
         for project in projects:
             project_type = project.type
-            openstack_status = None
-
-            # Get OpenStack project status (if project exists in Keystone)
-            try:
-                os_project = conn.identity.get_project(project.openstack_id)
-                openstack_status = "enabled" if os_project.is_enabled else "disabled"
-            except Exception as e:
-                openstack_status = f"❌ error: {str(e)}"
-            user_id = user_map.get(project.id)
-            user = User.objects.filter(id=user_id).first() if user_id else None
             result.append({
                 "project_id": project.id,
                 "project_name": project.name,
@@ -169,12 +187,32 @@ class AllProjectsOverview(APIView):
                     "id": project_type.id if project_type else None,
                     "name": project_type.name if project_type else None,
                 },
-                "user_id": user_id,
-                "username": user.username if user else None,
-                "status": openstack_status,
+                "user_id": project.owner_id,
+                "username": project.owner_username,
+                "status": keystone_status.get(project.openstack_id, missing_status),
             })
 
-        return Response(result)
+        return params.response(result, next_after)
+
+    @staticmethod
+    def _keystone_status(conn):
+        """
+        {openstack_id: "enabled"|"disabled"} from one Keystone project listing,
+        cached for ALL_PROJECTS_STATUS_CACHE_TTL seconds.
+        """
+        cached = cache_get(KEYSTONE_PROJECT_STATUS_KEY)
+        if cached is not None:
+            return cached
+
+        statuses = {
+            os_project.id: "enabled" if os_project.is_enabled else "disabled"
+            for os_project in conn.identity.projects()
+        }
+        cache_set(
+            KEYSTONE_PROJECT_STATUS_KEY, statuses,
+            ex=getattr(settings, "ALL_PROJECTS_STATUS_CACHE_TTL", 30),
+        )
+        return statuses
 
 
 class CreateProjectView(APIView):
@@ -211,6 +249,11 @@ class CreateProjectView(APIView):
                 is_enabled=True,
                 domain_id="default"
             )
+            try:
+                redis_client.delete(KEYSTONE_PROJECT_STATUS_KEY)
+            except Exception as e:
+                # The Keystone project exists; carry on with quotas and the IP allocation
+                logger.warning(f"Failed to invalidate {KEYSTONE_PROJECT_STATUS_KEY}: {e}")
 
             # Step 3: Apply quotas from ProjectType
             try:
@@ -265,20 +308,10 @@ class CreateProjectView(APIView):
 
             floating_ip_quota = project_type.floating_ips
 
-            available_ips = FloatingIPPool.objects.filter(
-                status=IPStatus.AVAILABLE
-            ).order_by('created_at')[:floating_ip_quota]
-
-            if available_ips.count() < floating_ip_quota:
-                return Response({
-                    "error": f"Not enough available floating IPs in pool. Required: {floating_ip_quota}, Available: {available_ips.count()}"
-                }, status=400)
-
-            # Update IPs in DB
-            for ip in available_ips:
-                ip.project_id = os_project.id
-                ip.status = IPStatus.RESERVED
-                ip.save()
+            try:
+                allocate_floating_ips(floating_ip_quota, os_project.id)
+            except NotEnoughFloatingIPs as e:
+                return Response({"error": str(e)}, status=400)
 
             # Step 5 (optional): assign project owner
             if assign_user_id:
@@ -369,6 +402,7 @@ class ChangeVPSTypeView(APIView):
             # Update in local DB
             project.type = new_type
             project.save()
+            invalidate_limits(project.openstack_id)
 
             return Response({
                 "message": "VPS type updated successfully.",
@@ -450,6 +484,7 @@ class ClientChangeVPSTypeView(APIView):
             # Update in local DB
             project.type = new_type
             project.save()
+            invalidate_limits(project.openstack_id)
 
             return Response({
                 "message": "VPS type updated successfully.",
@@ -588,7 +623,7 @@ class ReplaceProjectOwnerView(APIView):
 
 
 
-class AdminProjectDetailView(APIView):
+class AdminProjectDetailView(AsyncAPIView):
     permission_classes = [IsAdmin]
 
     @staticmethod
@@ -615,23 +650,29 @@ class AdminProjectDetailView(APIView):
         response.raise_for_status()
         return response.json().get("quota_set", {})
 
-    def extract_vm_info(self, servers, project_id, flavor_map):
+    @staticmethod
+    async def aget_quota(url, atoken):
+        body = await aget_json(url, atoken, params={"usage": "True"})
+        return body.get("quota_set", {})
+
+    @staticmethod
+    def extract_vm_info(servers, flavor_map):
+        """
+        VM rows and vCPU/RAM usage from raw Nova server dicts of one project.
+        """
         vms = []
         cpu_used, ram_used = 0, 0
 
         for server in servers:
-            if getattr(server, "project_id", None) != project_id:
-                continue
-
-            flavor_id_raw = str(server.flavor.get("id"))
+            flavor_id_raw = str((server.get("flavor") or {}).get("id"))
             flavor = flavor_map.get(flavor_id_raw)
             if flavor:
-                cpu_used += flavor.vcpus
-                ram_used += flavor.ram
+                cpu_used += flavor["vcpus"]
+                ram_used += flavor["ram"]
 
             # Extract IP
             ip = ""
-            for net in server.get("addresses", {}).values():
+            for net in (server.get("addresses") or {}).values():
                 if isinstance(net, list) and net:
                     ip = next(
                         (a["addr"] for a in net if a.get("OS-EXT-IPS:type") == "floating" and a.get("version") == 4),
@@ -640,61 +681,61 @@ class AdminProjectDetailView(APIView):
                     break
 
             vms.append({
-                "id": server.id,
-                "name": server.name,
-                "status": server.status,
+                "id": server["id"],
+                "name": server.get("name"),
+                "status": server.get("status"),
                 "ip": ip,
-                "created": server.created_at[:10] if server.created_at else "",
+                "created": (server.get("created") or "")[:10],
                 "flavor": {
-                    "id": str(flavor.id) if flavor else flavor_id_raw,
-                    "name": flavor.name if flavor else "Unknown",
-                    "vcpus": flavor.vcpus if flavor else 0,
-                    "ram": flavor.ram if flavor else 0,
-                    "disk": flavor.disk if flavor else 0,
+                    "id": str(flavor["id"]) if flavor else flavor_id_raw,
+                    "name": flavor["name"] if flavor else "Unknown",
+                    "vcpus": flavor["vcpus"] if flavor else 0,
+                    "ram": flavor["ram"] if flavor else 0,
+                    "disk": flavor["disk"] if flavor else 0,
                 }
             })
 
         return vms, cpu_used, ram_used
 
-    def get(self, request, openstack_id):
+    async def get(self, request, openstack_id):
         # Step 1: Get DB Project
-        project = get_object_or_404(Project, openstack_id=openstack_id)
+        project = await aget_object_or_404(Project.objects.select_related("type"), openstack_id=openstack_id)
         project_id = request.auth.get("project_id")
 
-        owner_mapping = ProjectUserMapping.objects.filter(project=project, is_active=True).first()
+        owner_mapping = await ProjectUserMapping.objects.select_related("user").filter(
+            project=project, is_active=True
+        ).afirst()
         owner = owner_mapping.user if owner_mapping else None
 
         # Step 2: Redis token
-        token = self.get_token_from_redis(request.user.username, project_id)
+        token = await aget_token(request.auth.get("username"), project_id)
         if not token:
             return Response({"error": "Token not found in Redis."}, status=401)
 
         try:
-            # Step 3: Connect to OpenStack
-            conn = connect_with_token_v5(token, project_id)
-            atoken = get_admin_token()
-
-            # Step 4: Fetch compute/storage quota concurrently
-            with ThreadPoolExecutor(max_workers=2) as executor:
-                compute_future = executor.submit(self.get_compute_quota, openstack_id, atoken)
-                storage_future = executor.submit(self.get_storage_quota, openstack_id, atoken)
-                nova_quota = compute_future.result()
-                cinder_quota = storage_future.result()
+            atoken = await sync_to_async(get_admin_token, thread_sensitive=False)()
+            compute_url = settings.OPENSTACK_COMPUTE_URL
+
+            # Step 3: Quotas, flavors and the project's servers concurrently;
+            # Nova filters servers by project and pages through them
+            nova_quota, cinder_quota, flavor_map, servers = await asyncio.gather(
+                self.aget_quota(f"{compute_url}/os-quota-sets/{openstack_id}", atoken),
+                self.aget_quota(f"{settings.OPENSTACK_BLOCK_STORAGE_URL}/os-quota-sets/{openstack_id}", atoken),
+                aget_flavor_map(token),
+                alist_pages(
+                    f"{compute_url}/servers/detail", token, "servers",
+                    {"all_tenants": 1, "project_id": project.openstack_id},
+                    page_size=settings.NOVA_PAGE_SIZE,
+                ),
+            )
 
             _, cpu_limit = self.safe_quota_get(nova_quota, "cores")
             _, ram_limit = self.safe_quota_get(nova_quota, "ram")
             storage_used, storage_limit = self.safe_quota_get(cinder_quota, "gigabytes")
 
-            # Step 5: Fetch flavor list once
-            flavors = conn.list_flavors()
-            flavor_map = {str(f.id): f for f in flavors}
-            flavor_map.update({str(f.name): f for f in flavors})
-
-            # Step 6: Fetch servers
-            servers = conn.list_servers()
-            vms, cpu_used, ram_used = self.extract_vm_info(servers, project.openstack_id, flavor_map)
+            vms, cpu_used, ram_used = self.extract_vm_info(servers, flavor_map)
 
-            # Step 7: Compile response
+            # Step 4: Compile response
             return Response({
                 "id": str(project.id),
                 "name": project.name,
@@ -727,7 +768,9 @@ class AdminProjectDetailView(APIView):
                 } if project.type else None
             })
 
-        except requests.HTTPError as http_err:
+        except httpx.HTTPStatusError as http_err:
+            if http_err.response.status_code == 401:
+                await sync_to_async(invalidate_admin_token, thread_sensitive=False)()
             return Response({"error": f"Quota fetch failed: {str(http_err)}"}, status=502)
         except Exception as e:
             return Response({"error": f"Unexpected error: {str(e)}"}, status=500)
@@ -800,6 +843,8 @@ class AdminProjectQuotaView(APIView):
             })
 
         except requests.HTTPError as http_err:
+            if http_err.response is not None and http_err.response.status_code == 401:
+                invalidate_admin_token()
             return Response({"error": f"Quota fetch failed: {str(http_err)}"}, status=502)
         except Exception as e:
             return Response({"error": f"Unexpected error: {str(e)}"}, status=500)
@@ -818,16 +863,15 @@ class AdminProjectVMsView(APIView):
 
         try:
             conn = connect_with_token_v5(token, project_id)
-            flavors = conn.list_flavors()
-            flavor_map = {str(f.id): f for f in flavors}
-            flavor_map.update({str(f.name): f for f in flavors})
+            flavor_map = get_flavor_map(conn)
 
-            servers = conn.list_servers(
-                all_projects=True,
-                filters={'project_id': project.openstack_id}
+            servers = iter_pages(
+                conn.compute, "/servers/detail", "servers",
+                {"all_tenants": 1, "project_id": project.openstack_id},
+                page_size=settings.NOVA_PAGE_SIZE,
             )
 
-            vms, cpu_used, ram_used = AdminProjectDetailView().extract_vm_info(servers, project.openstack_id, flavor_map)
+            vms, cpu_used, ram_used = AdminProjectDetailView.extract_vm_info(servers, flavor_map)
 
             return Response({
                 "cpu_used": cpu_used,
@@ -956,19 +1000,13 @@ class AvailableFloatingIPListView(APIView):
     permission_classes = [IsAdmin]
     def get(self, request):
         try:
-            floating_ips = FloatingIPPool.objects.filter(status="available")
+            params = PageParams(request)
+        except InvalidPageParams as e:
+            return Response({"detail": str(e)}, status=400)
 
-            data = [
-                {
-                    "ip_address": ip.ip_address,
-                    "subnet_id": ip.subnet_id,
-                    "network_id": ip.network_id,
-                    "note": ip.note,
-                }
-                for ip in floating_ips
-            ]
-
-            return Response(data, status=200)
+        try:
+            page, next_after = marker_page(iter_available_ips(params.after), params.limit, key=lambda item: item[0])
+            return params.response((row for _, row in page), next_after)
 
         except Exception as e:
             return Response({"detail": f"Failed to retrieve floating IPs: {str(e)}"}, status=500)
@@ -985,21 +1023,16 @@ class AssignFloatingIPView(APIView):
             return Response({"detail": "Missing 'ip_address' in request body."}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            ip_obj = get_object_or_404(FloatingIPPool, ip_address=ip_address)
-
-            if ip_obj.status == IPStatus.ALLOCATED:
-                return Response({"detail": f"IP {ip_address} is already allocated to another project."}, status=400)
-
-            # Assign IP to project only (no VM)
-            ip_obj.project_id = project_id
-            ip_obj.vm_id = None  # Ensure VM is unset
-            ip_obj.status = IPStatus.RESERVED
-            ip_obj.save()
+            claim_floating_ip(ip_address, project_id)
 
             return Response(
                 {"detail": f"Floating IP {ip_address} successfully assigned to project {project_id}."},
                 status=200
             )
 
+        except FloatingIPPool.DoesNotExist as e:
+            return Response({"detail": str(e)}, status=404)
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=400)
         except Exception as e:
             return Response({"detail": f"Error assigning floating IP: {str(e)}"}, status=500)
\ No newline at end of file
@@ -7,7 +7,6 @@ from django.conf import settings
 from django.http import request
 from openstack import connection
 
-from utils.token import get_admin_token_for_project
 
 
 @shared_task
@@ -22,39 +21,39 @@ def send_reset_password_email(email, uid, token):
 
 
 
-import requests
+from collections import Counter
+
 from celery import shared_task
 from django.conf import settings
+from utils.conn import get_admin_connection
+from utils.pagination import iter_pages
+from utils.singleflight import single_flight
 from .models import UserProfile
 
 
 @shared_task
+@single_flight(key_args=(), ttl=900)
 def update_user_vm_counts():
-    compute_url = settings.OPENSTACK_COMPUTE_URL
-
-    for profile in UserProfile.objects.select_related("user"):
-        project_id = profile.project_id
-        user_id = profile.openstack_user_id
-        if not project_id:
-            continue
-
-        try:
-            token = get_admin_token_for_project(project_id)
-            headers = {"X-Auth-Token": token}
-            servers_url = f"{compute_url}/servers/detail"
-            params = {"all_tenants": 0}
-
-            res = requests.get(servers_url, headers=headers, params=params)
-            res.raise_for_status()
-
-            servers = res.json().get("servers", [])
-            user_vm_count = sum(1 for s in servers if s.get("user_id") == user_id)
+    """
+    Recount UserProfile.vm_count from one paginated all_tenants server
+    listing, grouped by Keystone user_id in a single pass.
+    """
+    conn = get_admin_connection()
+
+    counts = Counter(
+        server.get("user_id")
+        for server in iter_pages(conn.compute, "/servers/detail", "servers", {"all_tenants": 1})
+    )
 
-            profile.vm_count = user_vm_count
-            profile.save(update_fields=["vm_count"])
+    changed = []
+    for profile in UserProfile.objects.only("id", "openstack_user_id", "vm_count").iterator(chunk_size=2000):
+        vm_count = counts.get(profile.openstack_user_id, 0) if profile.openstack_user_id else 0
+        if profile.vm_count != vm_count:
+            profile.vm_count = vm_count
+            changed.append(profile)
 
-        except Exception as e:
-            continue
+    UserProfile.objects.bulk_update(changed, ["vm_count"], batch_size=1000)
+    return f"✔ VM counts updated for {len(changed)} users"
 
 
 
@@ -23,6 +23,7 @@ from rest_framework.decorators import api_view
 from rest_framework.generics import ListAPIView
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from .models import UserProfile, UserRoleMapping, Role
+from utils.pagination import InvalidPageParams, PageParams, keyset_page
 from utils.redis_client import redis_client
 from rest_framework_simplejwt.tokens import RefreshToken, TokenError, AccessToken
 from rest_framework.views import APIView
@@ -763,9 +764,15 @@ class UserListView(APIView):
     permission_classes = [IsAdmin]
 
     def get(self, request):
-        queryset = UserProfile.objects.select_related("user").all()
-        serializer = UserListSerializer(queryset, many=True)
-        return Response(serializer.data)
+        try:
+            params = PageParams(request)
+        except InvalidPageParams as e:
+            return Response({"error": str(e)}, status=400)
+
+        queryset = UserProfile.objects.select_related("user")
+        page, next_after = keyset_page(queryset, params)
+        serializer = UserListSerializer(page, many=True)
+        return params.response(serializer.data, next_after)
 
 
 
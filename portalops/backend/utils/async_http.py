@@ -0,0 +1,79 @@
+"""
+Shared async HTTP client for the async (ASGI) views.
+
+Each event loop -- one per uvicorn worker in production -- gets one
+httpx.AsyncClient with a bounded keep-alive pool to the OpenStack endpoints
+configured in settings. Async views await many OpenStack calls concurrently on
+that pool instead of holding a worker thread per call.
+"""
+import asyncio
+import weakref
+
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from utils.redis_client import redis_client
+from utils.pagination import next_marker
+
+_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_client() -> httpx.AsyncClient:
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            timeout=settings.ASYNC_HTTP_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=settings.ASYNC_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.ASYNC_HTTP_MAX_KEEPALIVE,
+            ),
+        )
+        _clients[loop] = client
+    return client
+
+
+async def aget_token(username, project_id):
+    """
+    Async counterpart of the ``keystone_token:<username>:<project_id>`` lookup.
+    """
+    token = await sync_to_async(redis_client.get, thread_sensitive=False)(
+        f"keystone_token:{username}:{project_id}"
+    )
+    return token.decode() if isinstance(token, bytes) else token
+
+
+async def aget_json(url, token, params=None, headers=None, timeout=None):
+    """
+    GET an OpenStack API URL and return the decoded body.
+    Raises httpx.HTTPStatusError on error responses.
+    """
+    response = await get_async_client().get(
+        url,
+        params=params,
+        headers={"X-Auth-Token": token, **(headers or {})},
+        timeout=httpx.USE_CLIENT_DEFAULT if timeout is None else timeout,
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+async def aiter_pages(url, token, items_key, params=None, page_size=1000, headers=None):
+    """
+    Async counterpart of utils.pagination.iter_pages for a full endpoint URL.
+    """
+    params = {**(params or {}), "limit": page_size}
+    while True:
+        body = await aget_json(url, token, params=params, headers=headers)
+        for item in body.get(items_key, []):
+            yield item
+
+        marker = next_marker(body.get(f"{items_key}_links"))
+        if not marker:
+            return
+        params = {**params, "marker": marker}
+
+
+async def alist_pages(url, token, items_key, params=None, page_size=1000, headers=None):
+    return [item async for item in aiter_pages(url, token, items_key, params, page_size, headers)]
@@ -0,0 +1,83 @@
+"""
+Micro-benchmark for utils.cache_codec on an instances_cache-shaped payload.
+
+Usage (from the backend directory, no Django settings required):
+    python -m utils.bench_cache_codec [--vms 1000] [--rounds 200]
+"""
+import argparse
+import ast
+import random
+import timeit
+
+from utils import cache_codec
+
+
+def build_payload(vm_count):
+    rng = random.Random(42)
+    plans = [
+        "m1.small (1 vCPU / 2048MB / 20GB)",
+        "m1.medium (2 vCPU / 4096MB / 40GB)",
+        "m1.large (4 vCPU / 8192MB / 80GB)",
+    ]
+    payload = []
+    for i in range(vm_count):
+        payload.append({
+            "id": f"{rng.getrandbits(128):032x}",
+            "name": f"vps-{i:05d}",
+            "status": rng.choice(["Online", "Offline"]),
+            "fixed_ips": [f"10.0.{i // 250}.{i % 250 + 2}"],
+            "floating_ips": [f"203.0.113.{i % 250 + 2}"] if rng.random() < 0.6 else [],
+            "plan": rng.choice(plans),
+            "region": "nova",
+            "created": "2025-06-01",
+        })
+    return payload
+
+
+def _bench(label, encode, decode, rounds):
+    blob = encode()
+    enc = min(timeit.repeat(encode, number=rounds, repeat=3)) / rounds
+    dec = min(timeit.repeat(lambda: decode(blob), number=rounds, repeat=3)) / rounds
+    print(f"{label:<22} {len(blob):>10,d} B {enc * 1e6:>12.1f} us {dec * 1e6:>12.1f} us")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--vms", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    payload = build_payload(args.vms)
+
+    print(f"{args.vms} VMs, {args.rounds} rounds")
+    print(f"{'codec':<22} {'size':>12} {'encode':>15} {'decode':>15}")
+
+    _bench(
+        "str/ast.literal_eval",
+        lambda: str(payload).encode(),
+        lambda blob: ast.literal_eval(blob.decode()),
+        max(args.rounds // 20, 1),
+    )
+
+    serializers = ["json"]
+    if cache_codec.orjson is not None:
+        serializers.append("orjson")
+    if cache_codec.msgpack is not None:
+        serializers.append("msgpack")
+
+    compressions = ["none", "zlib"]
+    if cache_codec.lz4_frame is not None:
+        compressions.append("lz4")
+
+    for serializer in serializers:
+        for compression in compressions:
+            _bench(
+                f"{serializer}+{compression}",
+                lambda s=serializer, c=compression: cache_codec.encode(payload, s, c, threshold=0),
+                cache_codec.decode,
+                args.rounds,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Binary encoding for values stored in the Redis caches
+(instances_cache:*, catalog:*, volume_options:*, ...).
+
+Every payload starts with a 3-byte header: a zero byte, the serializer tag
+and the compression tag. Readers therefore decode whatever a writer with a
+different configuration produced, and anything without the header (values
+written before this module existed) is rejected as a cache miss.
+
+Backends:
+    serializers  -- "json" (stdlib), "orjson", "msgpack"
+    compression  -- "none", "zlib", "lz4" (applied above a size threshold)
+
+orjson, msgpack and lz4 are optional; a missing library falls back to the
+stdlib equivalent (json / zlib) when encoding.
+"""
+import json
+import zlib
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:  # pragma: no cover - optional dependency
+    lz4_frame = None
+
+MAGIC = b"\x00"
+
+# JSON produced by json and orjson is interchangeable, so both share one tag
+SERIALIZER_TAGS = {"json": b"j", "orjson": b"j", "msgpack": b"m"}
+COMPRESSION_TAGS = {"none": b"n", "zlib": b"z", "lz4": b"l"}
+
+DEFAULT_SERIALIZER = "orjson"
+DEFAULT_COMPRESSION = "zlib"
+DEFAULT_COMPRESSION_THRESHOLD = 4096
+
+
+class CacheDecodeError(ValueError):
+    pass
+
+
+def _setting(name, default):
+    try:
+        from django.conf import settings
+        return getattr(settings, name, default)
+    except Exception:
+        return default
+
+
+def _resolve_serializer(name):
+    if name == "orjson" and orjson is None:
+        return "json"
+    if name == "msgpack" and msgpack is None:
+        return "json"
+    if name not in SERIALIZER_TAGS:
+        raise ValueError(f"Unknown cache serializer: {name}")
+    return name
+
+
+def _resolve_compression(name):
+    if name == "lz4" and lz4_frame is None:
+        return "zlib"
+    if name not in COMPRESSION_TAGS:
+        raise ValueError(f"Unknown cache compression: {name}")
+    return name
+
+
+def _serialize(value, serializer):
+    if serializer == "orjson":
+        return orjson.dumps(value, default=str)
+    if serializer == "msgpack":
+        return msgpack.packb(value, use_bin_type=True, default=str)
+    return json.dumps(value, separators=(",", ":"), default=str).encode()
+
+
+def _deserialize(data, tag):
+    if tag == b"j":
+        return orjson.loads(data) if orjson is not None else json.loads(data)
+    if tag == b"m":
+        if msgpack is None:
+            raise CacheDecodeError("msgpack payload but msgpack is not installed")
+        return msgpack.unpackb(data, raw=False)
+    raise CacheDecodeError(f"Unknown serializer tag {tag!r}")
+
+
+def _compress(data, compression):
+    if compression == "zlib":
+        return zlib.compress(data, 1)
+    if compression == "lz4":
+        return lz4_frame.compress(data)
+    return data
+
+
+def _decompress(data, tag):
+    if tag == b"n":
+        return data
+    if tag == b"z":
+        return zlib.decompress(data)
+    if tag == b"l":
+        if lz4_frame is None:
+            raise CacheDecodeError("lz4 payload but lz4 is not installed")
+        return lz4_frame.decompress(data)
+    raise CacheDecodeError(f"Unknown compression tag {tag!r}")
+
+
+def encode(value, serializer=None, compression=None, threshold=None):
+    """
+    Serialize ``value`` to bytes, compressing it when it is larger than
+    ``threshold`` bytes. Defaults come from the CACHE_SERIALIZER,
+    CACHE_COMPRESSION and CACHE_COMPRESSION_THRESHOLD settings.
+    """
+    serializer = _resolve_serializer(serializer or _setting("CACHE_SERIALIZER", DEFAULT_SERIALIZER))
+    compression = _resolve_compression(compression or _setting("CACHE_COMPRESSION", DEFAULT_COMPRESSION))
+    if threshold is None:
+        threshold = _setting("CACHE_COMPRESSION_THRESHOLD", DEFAULT_COMPRESSION_THRESHOLD)
+
+    data = _serialize(value, serializer)
+    if compression == "none" or len(data) <= threshold:
+        compression = "none"
+    else:
+        data = _compress(data, compression)
+
+    return MAGIC + SERIALIZER_TAGS[serializer] + COMPRESSION_TAGS[compression] + data
+
+
+def decode(payload):
+    """
+    Inverse of ``encode``. Raises CacheDecodeError for payloads that were not
+    produced by this module.
+    """
+    if isinstance(payload, str):
+        payload = payload.encode("latin-1")
+    if not payload or len(payload) < 3 or payload[:1] != MAGIC:
+        raise CacheDecodeError("Payload has no cache codec header")
+
+    try:
+        return _deserialize(_decompress(payload[3:], payload[2:3]), payload[1:2])
+    except CacheDecodeError:
+        raise
+    except Exception as e:
+        raise CacheDecodeError(str(e)) from e
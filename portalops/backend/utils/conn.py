@@ -1,37 +1,85 @@
+import hashlib
+
 from openstack import connection
 from django.conf import settings
 from keystoneauth1 import session
 from keystoneauth1.identity import v3
 
+from utils.ttl_cache import TTLCache
 
-def connect_with_token(token, project_id):
+# Seconds before token expiry at which a cached connection is dropped
+TOKEN_EXPIRY_MARGIN = 60
+
+
+def _token_still_valid(conn):
     """
-    Basic connection to OpenStack with token and project_id.
+    A cached connection is reusable until its Keystone token is about to expire.
+    The auth ref is only known after the first call, so fresh connections pass.
     """
+    auth_ref = getattr(conn.session.auth, "auth_ref", None)
+    if auth_ref is None:
+        return True
+    return not auth_ref.will_expire_soon(stale_duration=TOKEN_EXPIRY_MARGIN)
+
+
+# Process-wide pool of authenticated connections. Reusing a Connection keeps its
+# keystoneauth Session, the underlying requests keep-alive pool and the already
+# discovered service catalog, so only the first request per token pays for them.
+_connection_cache = TTLCache(
+    maxsize=getattr(settings, "OPENSTACK_CONN_CACHE_SIZE", 256),
+    ttl=getattr(settings, "OPENSTACK_CONN_CACHE_TTL", 3600),
+    is_valid=_token_still_valid,
+)
+
+
+def _cache_key(kind, token, project_id):
+    if isinstance(token, bytes):
+        token = token.decode()
+    token_hash = hashlib.sha256(token.encode()).hexdigest() if token else ""
+    return kind, token_hash, project_id
+
+
+def get_cached_connection(kind, token, project_id, factory):
+    """
+    Return a pooled connection for (kind, token, project_id), creating it
+    with ``factory()`` on first use.
+    """
+    return _connection_cache.get_or_create(_cache_key(kind, token, project_id), factory)
+
+
+def _build_token_connection(token, project_id, verify=True, **conn_kwargs):
+    if isinstance(token, bytes):
+        token = token.decode()
     auth = v3.Token(
         auth_url=settings.OPENSTACK_AUTH_URL,
         token=token,
         project_id=project_id
     )
-    sess = session.Session(auth=auth)
-    return connection.Connection(session=sess)
+    sess = session.Session(auth=auth, verify=verify)
+    return connection.Connection(session=sess, **conn_kwargs)
 
 
-def vl_connect_with_token(token, project_id):
+def connect_with_token(token, project_id):
     """
-    Connection to OpenStack block storage with endpoint override from settings.
+    Basic connection to OpenStack with token and project_id.
     """
-    auth = v3.Token(
-        auth_url=settings.OPENSTACK_AUTH_URL,
-        token=token,
-        project_id=project_id
+    return get_cached_connection(
+        "default", token, project_id,
+        lambda: _build_token_connection(token, project_id),
     )
-    sess = session.Session(auth=auth)
 
-    return connection.Connection(
-        session=sess,
-        block_storage_api_version='3',
-        block_storage_endpoint_override=settings.OPENSTACK_BLOCK_STORAGE_URL
+
+def vl_connect_with_token(token, project_id):
+    """
+    Connection to OpenStack block storage with endpoint override from settings.
+    """
+    return get_cached_connection(
+        "block_storage", token, project_id,
+        lambda: _build_token_connection(
+            token, project_id,
+            block_storage_api_version='3',
+            block_storage_endpoint_override=settings.OPENSTACK_BLOCK_STORAGE_URL,
+        ),
     )
 
 
@@ -39,20 +87,24 @@ def connect_with_token_v5(token, project_id):
     """
     Connection with token (verify=False) for special VNC or insecure SSL needs.
     """
-    auth = v3.Token(
-        auth_url=settings.OPENSTACK_AUTH_URL,
-        token=token,
-        project_id=project_id,
+    return get_cached_connection(
+        "insecure", token, project_id,
+        lambda: _build_token_connection(token, project_id, verify=False),
     )
-    sess = session.Session(auth=auth, verify=False)
-    return connection.Connection(session=sess)
+
 
 def get_admin_connection(project_id=None):
-    return connection.Connection(
-        auth_url=settings.OPENSTACK_AUTH_URL,
-        project_id=project_id or settings.OPENSTACK_ADMIN_PROJECT_ID,
-        username=settings.OPENSTACK_ADMIN_NAME,
-        password=settings.OPENSTACK_ADMIN_PASSWORD,
-        user_domain_name=settings.USER_DOMAIN_NAME,
-        project_domain_name=settings.PROJECT_DOMAIN_NAME,
+    project_id = project_id or settings.OPENSTACK_ADMIN_PROJECT_ID
+    # Password auth re-authenticates on its own, so admin connections only
+    # need to be keyed by project.
+    return get_cached_connection(
+        "admin", None, project_id,
+        lambda: connection.Connection(
+            auth_url=settings.OPENSTACK_AUTH_URL,
+            project_id=project_id,
+            username=settings.OPENSTACK_ADMIN_NAME,
+            password=settings.OPENSTACK_ADMIN_PASSWORD,
+            user_domain_name=settings.USER_DOMAIN_NAME,
+            project_domain_name=settings.PROJECT_DOMAIN_NAME,
+        ),
     )
@@ -0,0 +1,140 @@
+"""
+Shared cursor pagination for list endpoints.
+
+Clients send ``limit`` (capped at PAGE_MAX_LIMIT), an opaque ``cursor`` taken
+from the previous response and optionally ``fields=id,name`` to project rows.
+A request with neither ``limit`` nor ``cursor`` gets the full, unpaginated
+list as before.
+The body stays a plain JSON array; the next cursor is returned in the
+X-Next-Cursor header and as a ``Link: <...>; rel="next"`` header, and is absent
+on the last page. The cursor wraps an OpenStack ``marker`` or a DB keyset value.
+"""
+import base64
+import json
+from itertools import islice
+from urllib.parse import parse_qs, urlparse
+
+from django.conf import settings
+from django.utils.http import urlencode
+from rest_framework.response import Response
+
+
+def next_marker(links):
+    """
+    Marker of the ``rel=next`` link in an OpenStack ``*_links`` list, or None.
+    """
+    for link in links or []:
+        if link.get("rel") == "next":
+            return parse_qs(urlparse(link["href"]).query).get("marker", [None])[0]
+    return None
+
+
+class InvalidPageParams(ValueError):
+    pass
+
+
+def encode_cursor(value):
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError):
+        raise InvalidPageParams("Invalid cursor")
+
+
+class PageParams:
+    """
+    ``limit``, decoded ``after`` value and ``fields`` of a list request.
+    ``limit`` is None when the client did not ask for pagination.
+    """
+
+    def __init__(self, request):
+        default_limit = getattr(settings, "PAGE_DEFAULT_LIMIT", 100)
+        max_limit = getattr(settings, "PAGE_MAX_LIMIT", 1000)
+
+        cursor = request.query_params.get("cursor")
+        fields = request.query_params.get("fields")
+        raw_limit = request.query_params.get("limit")
+
+        limit = None
+        if raw_limit is not None or cursor:
+            try:
+                limit = int(raw_limit or default_limit)
+            except ValueError:
+                raise InvalidPageParams("limit must be an integer")
+            if limit < 1:
+                raise InvalidPageParams("limit must be positive")
+            limit = min(limit, max_limit)
+
+        self.request = request
+        self.limit = limit
+        self.after = decode_cursor(cursor) if cursor else None
+        self.fields = [f for f in fields.split(",") if f] if fields else None
+
+    def project(self, row):
+        if not self.fields:
+            return row
+        return {field: row[field] for field in self.fields if field in row}
+
+    def response(self, rows, next_after=None, headers=None):
+        """
+        Return ``rows`` (an iterable of dicts) as the page body. Pages are
+        bounded by PAGE_MAX_LIMIT, so a plain Response is used; a sync
+        streaming body would be buffered by Django under ASGI anyway.
+        """
+        headers = dict(headers or {})
+        if next_after is not None:
+            cursor = encode_cursor(next_after)
+            query = {**self.request.query_params.dict(), "cursor": cursor}
+            url = self.request.build_absolute_uri(f"{self.request.path}?{urlencode(query)}")
+            headers["X-Next-Cursor"] = cursor
+            headers["Link"] = f'<{url}>; rel="next"'
+        return Response([self.project(row) for row in rows], headers=headers)
+
+
+def marker_page(rows, limit, key=lambda row: row["id"]):
+    """
+    Take one page from a lazily paginated OpenStack listing. Only the pages
+    needed for ``limit`` rows are fetched; a None limit takes every row.
+    Returns (rows, next marker or None).
+    """
+    if limit is None:
+        return list(rows), None
+    page = list(islice(rows, limit))
+    marker = key(page[-1]) if len(page) == limit else None
+    return page, marker
+
+
+def keyset_page(queryset, params, field="id"):
+    """
+    One page of ``queryset`` ordered by ``field``, resuming after the cursor
+    value. Returns (objects, next value or None).
+    """
+    queryset = queryset.order_by(field)
+    if params.after is not None:
+        queryset = queryset.filter(**{f"{field}__gt": params.after})
+    if params.limit is None:
+        return list(queryset), None
+    page = list(queryset[:params.limit])
+    next_after = getattr(page[-1], field) if len(page) == params.limit else None
+    return page, next_after
+
+
+def iter_pages(proxy, path, items_key, params=None, page_size=1000):
+    """
+    Raw OpenStack listing through an SDK proxy (compute, block_storage,
+    network, ...), following the ``<items_key>_links`` markers lazily.
+    """
+    params = {**(params or {}), "limit": page_size}
+    while True:
+        response = proxy.get(path, params=params)
+        response.raise_for_status()
+        body = response.json()
+        yield from body.get(items_key, [])
+
+        marker = next_marker(body.get(f"{items_key}_links"))
+        if not marker:
+            return
+        params = {**params, "marker": marker}
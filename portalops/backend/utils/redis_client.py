@@ -1,9 +1,59 @@
+"""
+The one Redis client of the project.
+
+Every module imports ``redis_client`` (str responses) or ``redis_raw_client``
+(bytes, for utils.cache_codec payloads) from here. Both sit on a bounded
+BlockingConnectionPool, so each gunicorn or celery worker process keeps at
+most REDIS_MAX_CONNECTIONS sockets per client and reuses them.
+"""
 import redis
 from django.conf import settings
 
-redis_client = redis.StrictRedis(
-    host=settings.REDIS_HOST,
-    port=settings.REDIS_PORT,
-    db=settings.REDIS_DB,
-    decode_responses=True
-)
+from utils.cache_codec import CacheDecodeError, decode, encode
+
+
+def _build_pool(decode_responses):
+    kwargs = {
+        "db": settings.REDIS_DB,
+        "password": getattr(settings, "REDIS_PASSWORD", None) or None,
+        "max_connections": getattr(settings, "REDIS_MAX_CONNECTIONS", 20),
+        # Seconds to wait for a free connection before raising
+        "timeout": getattr(settings, "REDIS_POOL_TIMEOUT", 5),
+        "health_check_interval": getattr(settings, "REDIS_HEALTH_CHECK_INTERVAL", 30),
+        "socket_timeout": getattr(settings, "REDIS_SOCKET_TIMEOUT", 5),
+        "socket_connect_timeout": getattr(settings, "REDIS_SOCKET_TIMEOUT", 5),
+        "protocol": getattr(settings, "REDIS_PROTOCOL", 2),
+        "decode_responses": decode_responses,
+    }
+
+    socket_path = getattr(settings, "REDIS_SOCKET_PATH", None)
+    if socket_path:
+        kwargs.update(connection_class=redis.UnixDomainSocketConnection, path=socket_path)
+    else:
+        kwargs.update(host=settings.REDIS_HOST, port=settings.REDIS_PORT, socket_keepalive=True)
+
+    return redis.BlockingConnectionPool(**kwargs)
+
+
+redis_client = redis.StrictRedis(connection_pool=_build_pool(decode_responses=True))
+
+# Binary-safe client for values written through utils.cache_codec
+redis_raw_client = redis.StrictRedis(connection_pool=_build_pool(decode_responses=False))
+
+
+def cache_get(key, default=None):
+    """
+    Read and decode a cached value. Missing keys and payloads that cannot be
+    decoded (e.g. written by an older release) both return ``default``.
+    """
+    payload = redis_raw_client.get(key)
+    if payload is None:
+        return default
+    try:
+        return decode(payload)
+    except CacheDecodeError:
+        return default
+
+
+def cache_set(key, value, ex=None):
+    redis_raw_client.set(key, encode(value), ex=ex)
@@ -0,0 +1,97 @@
+"""
+Single-flight execution for Celery tasks (or any function) backed by Redis.
+
+While one call for a given key is running, concurrent calls with the same key
+are suppressed instead of repeating the same OpenStack crawl. A suppressed call
+can optionally wait for the running one and then read its result from the cache
+(``join_timeout`` / ``on_join``). Executed and suppressed calls are counted per
+function in the ``singleflight:stats`` Redis hash.
+"""
+import functools
+import hashlib
+import inspect
+import logging
+import time
+import uuid
+
+from utils.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+STATS_KEY = "singleflight:stats"
+
+_release_script = redis_client.register_script(
+    "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0"
+)
+
+
+def flight_key(name, values):
+    digest = hashlib.sha1(":".join(str(v) for v in values).encode()).hexdigest()
+    return f"singleflight:{name}:{digest}"
+
+
+def _count(name, outcome):
+    try:
+        redis_client.hincrby(STATS_KEY, f"{name}:{outcome}", 1)
+    except Exception:
+        pass
+
+
+def single_flight(key_args, ttl=120, join_timeout=0, on_join=None, group=None):
+    """
+    Decorator. ``key_args`` names the arguments that identify a flight, e.g.
+    ("username", "project_id") -- tokens and other per-call values stay out of
+    the key. The Redis lock (SET NX PX) expires after ``ttl`` seconds even if the
+    owner dies. Suppressed calls return ``on_join(*args, **kwargs)`` after
+    waiting up to ``join_timeout`` seconds for the running call, or None.
+    Functions decorated with the same ``group`` share one lock, so they never
+    run at the same time; stats stay per function.
+
+    Apply it below ``@shared_task`` so the worker runs the guarded function.
+    """
+
+    def decorator(func):
+        signature = inspect.signature(func)
+        name = f"{func.__module__}.{func.__name__}"
+
+        def key_for(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            return flight_key(group or name, [bound.arguments[arg] for arg in key_args])
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = key_for(*args, **kwargs)
+            owner = uuid.uuid4().hex
+
+            if redis_client.set(key, owner, nx=True, px=int(ttl * 1000)):
+                _count(name, "executed")
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    _release_script(keys=[key], args=[owner])
+
+            _count(name, "suppressed")
+            logger.info(f"[single-flight] {name} already running for {key}, joining")
+
+            deadline = time.monotonic() + join_timeout
+            while time.monotonic() < deadline and redis_client.exists(key):
+                time.sleep(0.2)
+
+            return on_join(*args, **kwargs) if on_join else None
+
+        wrapper.flight_key = key_for
+        return wrapper
+
+    return decorator
+
+
+def get_single_flight_stats():
+    """
+    {"<module.function>": {"executed": n, "suppressed": n}, ...}
+    """
+    stats = {}
+    for field, value in redis_client.hgetall(STATS_KEY).items():
+        name, _, outcome = field.rpartition(":")
+        stats.setdefault(name, {"executed": 0, "suppressed": 0})[outcome] = int(value)
+    return stats
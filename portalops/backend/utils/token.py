@@ -1,39 +1,43 @@
+import json
+import threading
+import time
+import uuid
+
 import requests
 from django.conf import settings
+from django.utils.dateparse import parse_datetime
 
+from utils.redis_client import redis_client
+from utils.ttl_cache import TTLCache
 
-def get_admin_token_for_project(project_id):
-    url = f"{settings.OPENSTACK_AUTH_URL}/auth/tokens"
+# Refresh admin tokens this many seconds before Keystone's expires_at
+ADMIN_TOKEN_REFRESH_MARGIN = 300
+# How long a process waits for another worker that is already refreshing
+ADMIN_TOKEN_LOCK_TIMEOUT = 15
 
-    payload = {
-        "auth": {
-            "identity": {
-                "methods": ["password"],
-                "password": {
-                    "user": {
-                        "name": settings.OPENSTACK_ADMIN_NAME,
-                        "domain": {"name": settings.OPENSTACK_USER_DOMAIN_NAME},
-                        "password": settings.OPENSTACK_ADMIN_PASS
-                    }
-                }
-            },
-            "scope": {
-                "project": {
-                    "id": project_id
-                }
-            }
-        }
-    }
+_token_cache = TTLCache(maxsize=512, ttl=3600)
+_refresh_locks = {}
+_refresh_locks_guard = threading.Lock()
 
-    headers = {"Content-Type": "application/json"}
 
-    res = requests.post(url, json=payload, headers=headers)
-    res.raise_for_status()
-    return res.headers["X-Subject-Token"]
+def _refresh_lock(scope_key):
+    with _refresh_locks_guard:
+        return _refresh_locks.setdefault(scope_key, threading.Lock())
 
 
+def _is_fresh(entry):
+    return entry is not None and entry["expires_at"] - ADMIN_TOKEN_REFRESH_MARGIN > time.time()
 
-def get_admin_token():
+
+def _is_usable(entry):
+    return entry is not None and entry["expires_at"] > time.time()
+
+
+def _request_admin_token(scope):
+    """
+    Password-authenticate the admin user against Keystone for the given scope.
+    Returns {"token": ..., "expires_at": <epoch seconds>}.
+    """
     payload = {
         "auth": {
             "identity": {
@@ -41,17 +45,12 @@ def get_admin_token():
                 "password": {
                     "user": {
                         "name": settings.OPENSTACK_ADMIN_NAME,
-                        "domain": { "name": settings.USER_DOMAIN_NAME },
+                        "domain": {"name": settings.USER_DOMAIN_NAME},
                         "password": settings.OPENSTACK_ADMIN_PASSWORD
                     }
                 }
             },
-            "scope": {
-                "project": {
-                    "name": settings.OPENSTACK_ADMIN_NAME,  # or admin project name
-                    "domain": { "name": settings.PROJECT_DOMAIN_NAME }
-                }
-            }
+            "scope": scope
         }
     }
 
@@ -68,4 +67,115 @@ def get_admin_token():
     if not token:
         raise Exception("Token not found in response headers")
 
-    return token
\ No newline at end of file
+    expires_at = parse_datetime(response.json().get("token", {}).get("expires_at", ""))
+    expires_ts = expires_at.timestamp() if expires_at else time.time() + 3600
+
+    return {"token": token, "expires_at": expires_ts}
+
+
+def _load_shared(redis_key):
+    try:
+        raw = redis_client.get(redis_key)
+        return json.loads(raw) if raw else None
+    except Exception:
+        return None
+
+
+def _store(scope_key, redis_key, entry):
+    ttl = int(entry["expires_at"] - time.time())
+    if ttl <= 0:
+        return
+    _token_cache.set(scope_key, entry, ttl=ttl)
+    try:
+        redis_client.set(redis_key, json.dumps(entry), ex=ttl)
+    except Exception:
+        pass
+
+
+def _get_cached_admin_token(scope_key, scope):
+    """
+    Return an admin token for ``scope`` from process memory or Redis, asking
+    Keystone only when the cached token is close to expiry. Concurrent refreshes
+    are collapsed into one Keystone call per process (thread lock) and across
+    gunicorn/celery workers (Redis lock).
+    """
+    redis_key = f"admin_token:{scope_key}"
+
+    entry = _token_cache.get(scope_key)
+    if _is_fresh(entry):
+        return entry["token"]
+
+    with _refresh_lock(scope_key):
+        entry = _token_cache.get(scope_key)
+        if _is_fresh(entry):
+            return entry["token"]
+
+        shared = _load_shared(redis_key)
+        if _is_fresh(shared):
+            _store(scope_key, redis_key, shared)
+            return shared["token"]
+
+        lock_key = f"{redis_key}:lock"
+        lock_value = uuid.uuid4().hex
+        try:
+            acquired = redis_client.set(lock_key, lock_value, nx=True, ex=ADMIN_TOKEN_LOCK_TIMEOUT)
+        except Exception:
+            acquired = True
+
+        if not acquired:
+            # Another worker is refreshing: serve the still-valid token if we
+            # have one, otherwise wait for the new one to land in Redis.
+            stale = shared if _is_usable(shared) else entry
+            if _is_usable(stale):
+                return stale["token"]
+
+            deadline = time.monotonic() + ADMIN_TOKEN_LOCK_TIMEOUT
+            while time.monotonic() < deadline:
+                time.sleep(0.1)
+                shared = _load_shared(redis_key)
+                if _is_usable(shared):
+                    _store(scope_key, redis_key, shared)
+                    return shared["token"]
+
+        try:
+            entry = _request_admin_token(scope)
+            _store(scope_key, redis_key, entry)
+            return entry["token"]
+        finally:
+            if acquired:
+                try:
+                    if redis_client.get(lock_key) == lock_value:
+                        redis_client.delete(lock_key)
+                except Exception:
+                    pass
+
+
+def get_admin_token_for_project(project_id):
+    return _get_cached_admin_token(
+        f"project:{project_id}",
+        {"project": {"id": project_id}},
+    )
+
+
+def get_admin_token():
+    return _get_cached_admin_token(
+        "admin",
+        {
+            "project": {
+                "name": settings.OPENSTACK_ADMIN_NAME,  # or admin project name
+                "domain": {"name": settings.PROJECT_DOMAIN_NAME}
+            }
+        },
+    )
+
+
+def invalidate_admin_token(project_id=None):
+    """
+    Drop a cached admin token, e.g. after Keystone rejected it.
+    """
+    scope_key = f"project:{project_id}" if project_id else "admin"
+    _token_cache.delete(scope_key)
+    try:
+        redis_client.delete(f"admin_token:{scope_key}")
+    except Exception:
+        pass
@@ -0,0 +1,65 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """
+    Small thread-safe LRU cache with a per-entry expiry.
+
+    Entries are evicted when they expire, when the cache grows past
+    ``maxsize`` (least recently used first), or when ``is_valid`` rejects
+    them on lookup.
+    """
+
+    def __init__(self, maxsize=128, ttl=300, is_valid=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.is_valid = is_valid
+        self._data = OrderedDict()
+        self._lock = threading.RLock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+
+            value, expires_at = item
+            if expires_at <= time.monotonic() or (self.is_valid and not self.is_valid(value)):
+                del self._data[key]
+                return default
+
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_or_create(self, key, factory, ttl=None):
+        """
+        Return the cached value for ``key``, building it with ``factory()``
+        under the cache lock when missing so concurrent callers share one build.
+        """
+        with self._lock:
+            value = self.get(key)
+            if value is None:
+                value = factory()
+                self.set(key, value, ttl=ttl)
+            return value
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)